@@ -14,13 +14,12 @@ Este app:
 from __future__ import annotations
 
 import time
-from collections.abc import Mapping
 import re
+from functools import partial
 
+import numpy as np
 import pandas as pd
 import streamlit as st
-import yaml
-from yaml.loader import SafeLoader
 
 from streamlit_gsheets import GSheetsConnection
 import streamlit_authenticator as stauth
@@ -28,11 +27,14 @@ import streamlit_authenticator as stauth
 # -- Imports dos módulos locais --
 # (Mantendo o try/except para segurança)
 try:
-    from my_pkg.transform.metrics import load_metrics
-    from my_pkg.transform.execucao_view import load_execucao_view
-    from my_pkg.transform.rp_view import load_rp_view
-    from my_pkg.transform.schema import (
-        ALL_COLS, NUMERIC_COLS, BOOL_COLS, EDITABLE_COLS, REQUIRED_ON_NEW
+    from my_pkg.transform.schema import ALL_COLS, READONLY_COLS_DYNAMIC
+    from my_pkg.ui.common import (
+        brl, parse_brl_series, to_csv_bytes,
+        load_auth_from_secrets, hashed_credentials, resolve_allowed_uos,
+        validate_new_rows, apply_editor_edits,
+        load_sheet, clear_sheet_cache, filter_options, display_frame,
+        update_sheet, load_metrics_cached, load_execucao_view_cached,
+        load_rp_view_cached,
     )
 except ImportError:
     st.error("Erro: Módulos locais não encontrados.")
@@ -72,162 +74,59 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =============================================================================
-# Funções Utilitárias
+# Configuração de Colunas do Cronograma
 # =============================================================================
-
-
-def brl(value: float) -> str:
-    """Formata float para string de moeda BRL."""
-    if pd.isna(value):
-        return "R$ 0,00"
-    try:
-        return f"R$ {float(value):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except:
-        return "R$ 0,00"
-
-
-def format_brl_edit(value) -> str:
-    """Converte valor numérico para texto formato BR (R$ 1.000,00) para o Editor."""
-    if pd.isna(value) or value == "":
-        return ""
-    try:
-        val = float(value)
-        if val == 0:
-            return "R$ 0,00"
-        return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except (ValueError, TypeError):
-        return str(value)
-
-
-def parse_brl_edit(value_str) -> float:
-    """Converte string formato BR (R$ 1.000,00) de volta para float."""
-    if isinstance(value_str, (int, float)):
-        return float(value_str)
-    if pd.isna(value_str) or str(value_str).strip() == "":
-        return 0.0
-
-    clean_str = str(value_str).replace("R$", "").replace(
-        " ", "").replace(".", "").replace(",", ".")
-    try:
-        return float(clean_str)
-    except ValueError:
-        return 0.0
-
-
-def _to_plain_dict(obj):
-    if isinstance(obj, Mapping):
-        return {k: _to_plain_dict(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_to_plain_dict(x) for x in obj]
-    return obj
-
-
-def load_rbac_from_secrets() -> dict[str, list]:
-    raw = st.secrets.get("rbac", {})
-    out: dict[str, list] = {}
-    for user, lst in raw.items():
-        if isinstance(lst, list) and len(lst) == 1 and lst[0] == "*":
-            out[user] = ["*"]
-        else:
-            out[user] = list(map(int, lst))
-    return out
-
-
-def load_access_yaml(path: str = "security/access_control.yaml") -> dict[str, list]:
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.load(f, Loader=SafeLoader) or {}
-        users = data.get("users", {})
-        return {u: v.get("allowed_uos", []) for u, v in users.items()}
-    except FileNotFoundError:
-        return {}
-
-
-def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+@st.cache_resource(show_spinner=False)
+def cronograma_column_config() -> dict:
     """
-    Normaliza dados brutos.
-    AGRESSIVIDADE NOS BOOLEANOS: Garante que colunas de Checkbox sejam bool puro.
+    Só depende de constantes: montada uma vez por processo (o Streamlit
+    clona cada entrada ao usar, então o dict compartilhado não é alterado).
     """
-    data = df.copy()
-
-    # 1. Garante todas as colunas
-    for c in ALL_COLS:
-        if c not in data.columns:
-            data[c] = None
-
-    # 2. Tratamento Numérico
-    for col in NUMERIC_COLS:
-        if col in data.columns:
-            if data[col].dtype == object:
-                data[col] = data[col].astype(str).str.replace(
-                    r"[R$\.\s]", "", regex=True).str.replace(",", ".")
-            data[col] = pd.to_numeric(data[col], errors="coerce").fillna(0.0)
-
-    # 3. Tratamento Booleano (CRÍTICO PARA O CHECKBOX FUNCIONAR)
-    planejado_cols = [f"{i}_bimestre_planejado" for i in range(1, 7)]
-    target_bool_cols = set(BOOL_COLS) | set(planejado_cols)
-
-    # Lista de valores que viram TRUE (ignorando maiúsculas/minúsculas)
-    TRUE_VALUES = ["TRUE", "1", "SIM", "S",
-                   "YES", "VERDADEIRO", "X", "OK", "V"]
-
-    for col in target_bool_cols:
-        if col in data.columns:
-            # Converte tudo para string, limpa espaços, joga pra maiúsculo
-            # e verifica se está na lista de 'Verdadeiros'
-            data[col] = data[col].astype(
-                str).str.strip().str.upper().isin(TRUE_VALUES)
-
-            # Força o tipo 'bool' do Python/Pandas
-            data[col] = data[col].astype(bool)
-
-    return data[ALL_COLS]
-
-
-def validate_new_rows(df_before, df_after, allowed_uos, is_admin, working_uo):
-    cols_key = ["uo_cod", "acao_cod", "intervencao_cod", "marcos_principais"]
-    before_idx = set(map(tuple, df_before[cols_key].astype(str).values))
-    after_idx = set(map(tuple, df_after[cols_key].astype(str).values))
-    new_keys = after_idx - before_idx
-
-    is_new = df_after.apply(lambda r: tuple(
-        r[cols_key].astype(str)) in new_keys, axis=1)
-    new_rows = df_after[is_new].copy()
-
-    if not new_rows.empty:
-        if (new_rows[REQUIRED_ON_NEW].isnull().any(axis=1).any() or (new_rows[REQUIRED_ON_NEW] == "").any(axis=1).any()):
-            return False, "Preencha todos os campos obrigatórios na nova linha.", df_after
-        # Nova linha já nasce marcada como Novo Marco (bool)
-        df_after.loc[is_new, "novo_marco"] = True
-
-    if not is_admin:
-        if df_after["uo_cod"].isnull().any():
-            return False, "Existem linhas sem UO definida.", df_after
-        uos_present = set(pd.to_numeric(
-            df_after["uo_cod"], errors="coerce").fillna(-1).astype(int).tolist())
-        if allowed_uos is None or not uos_present.issubset(set(allowed_uos)):
-            return False, "Você inseriu uma UO não autorizada.", df_after
-        if working_uo is not None and (uos_present - {working_uo}):
-            return False, f"As linhas devem pertencer à UO {working_uo}.", df_after
-
-    return True, "", df_after
+    cfg = {
+        "uo_cod": st.column_config.NumberColumn("UO", format="%d"),
+        "uo_sigla": st.column_config.TextColumn("UO Sigla"),
+        "acao_cod": st.column_config.NumberColumn("Ação", format="%d"),
+        "acao_desc": st.column_config.TextColumn("Ação Desc."),
+        "intervencao_cod": None,  # Oculto
+        "intervencao_desc": st.column_config.TextColumn("Intervenção"),
+        "marcos_principais": st.column_config.TextColumn("Marcos Principais"),
+        "novo_marco": st.column_config.CheckboxColumn("Novo Marco?", default=False),
+        "valor_previsto_total": st.column_config.TextColumn("Valor Plano Total", disabled=True),
+        "valor_replanejado_total": st.column_config.TextColumn("Valor Plano Replanejado"),
+    }
+
+    for i in range(1, 7):
+        # Planejado -> Checkbox
+        cfg[f"{i}_bimestre_planejado"] = st.column_config.CheckboxColumn(
+            f"{i}ºb Plano",
+            default=False
+        )
+        # Replanejado/Realizado -> Texto BR
+        cfg[f"{i}_bimestre_replanejado"] = st.column_config.TextColumn(
+            f"{i}ºb Replanejado")
+        cfg[f"{i}_bimestre_realizado"] = st.column_config.TextColumn(
+            f"{i}ºb Realizado")
+    return cfg
 
 
 # =============================================================================
 # Autenticação
 # =============================================================================
-auth_cfg = _to_plain_dict(st.secrets.get("auth", {}))
-credentials = _to_plain_dict(auth_cfg.get("credentials", {}))
+auth_cfg = load_auth_from_secrets()
+credentials = auth_cfg.get("credentials", {})
 
 if "usernames" not in credentials:
     st.error("Erro na configuração de credenciais (secrets).")
     st.stop()
 
+# O Authenticate fica fora de cache: ele cria o CookieManager (componente
+# renderizado em cada sessão) e inicializa o session_state do login.
 auth = stauth.Authenticate(
-    credentials=credentials,
+    credentials=hashed_credentials(credentials),
     cookie_name=auth_cfg.get("cookie_name", "propag_monitoramento"),
     cookie_key=auth_cfg.get("cookie_key", "chave_secreta_padrao"),
     cookie_expiry_days=int(auth_cfg.get("cookie_expiry_days", 1)),
+    auto_hash=False,
 )
 
 # --- LOGIN ---
@@ -258,14 +157,7 @@ with st.sidebar:
     auth.logout(button_name="Sair", location="sidebar", key="logout_sidebar")
     st.divider()
 
-rbac_secrets = load_rbac_from_secrets()
-rbac_yaml = load_access_yaml()
-allowed_uos_list = rbac_secrets.get(username, [])
-if not allowed_uos_list:
-    allowed_uos_list = rbac_yaml.get(username, [])
-
-is_admin = ("*" in allowed_uos_list)
-allowed_uos = None if is_admin else set(map(int, allowed_uos_list))
+is_admin, allowed_uos = resolve_allowed_uos(username)
 
 working_uo = None
 if is_admin:
@@ -285,7 +177,7 @@ else:
 # 1. Métricas
 # =============================================================================
 try:
-    vlr_plano, vlr_liq, saldo = load_metrics()
+    vlr_plano, vlr_liq, saldo = load_metrics_cached()
 except Exception as e:
     st.error(f"Erro ao carregar métricas: {e}")
     vlr_plano, vlr_liq, saldo = 0.0, 0.0, 0.0
@@ -311,78 +203,184 @@ spreadsheet = str(ss_cfg.get("spreadsheet", "")
                   or st.sidebar.text_input("ID Planilha Google"))
 worksheet = str(ss_cfg.get("worksheet", "Página1"))
 
-if not spreadsheet:
-    st.warning("⚠️ Planilha não configurada nos secrets.")
-else:
+# Recarregar fica fora do fragmento: a sidebar não pode ser escrita de
+# dentro de um st.fragment (e o clique deve reexecutar o app inteiro).
+if spreadsheet and st.sidebar.button("🔄 Recarregar dados"):
+    clear_sheet_cache()
+
+# Colunas monetárias do cronograma (Float -> Texto BR para edição)
+MONEY_COLS = ["valor_previsto_total", "valor_replanejado_total"] + [
+    f"{i}_bimestre_{k}" for i in range(1, 7)
+    for k in ("replanejado", "realizado")
+]
+
+
+def cronograma_filters(
+    data: pd.DataFrame, sheet_version: str
+) -> tuple[pd.DataFrame, pd.DataFrame, str, str]:
+    """
+    Filtros do cronograma. Devolve o recorte por UO (`df_view`), a sua
+    cópia formatada para edição (Texto BR) e a Ação/Intervenção escolhidas.
+    """
+    # Chave dos caches derivados: identifica leitura e recorte sem hashear o frame
+    opts_key = (f"{username}:{spreadsheet}:{worksheet}:{sheet_version}:"
+                f"{working_uo}")
+    c_f1, c_f2, c_f3 = st.columns(3)
+    with c_f1:
+        lista_uos = ["Todas"] + \
+            filter_options(opts_key, data, ("uo_sigla",))["uo_sigla"]
+        uo_sel = st.selectbox("Filtrar UO", lista_uos)
+
+    # Recorte por UO direto sobre `data` (a cópia para exibição vem abaixo)
+    df_view = data
+    if uo_sel != "Todas":
+        df_view = data.loc[data["uo_sigla"].eq(uo_sel).to_numpy()]
+
+    opts = filter_options(f"{opts_key}:{uo_sel}", df_view,
+                          ("acao_desc", "intervencao_desc"))
+    with c_f2:
+        lista_acoes = ["Todas"] + opts["acao_desc"]
+        acao_sel = st.selectbox("Filtrar Ação", lista_acoes)
+    with c_f3:
+        lista_interv = ["Todas"] + opts["intervencao_desc"]
+        interv_sel = st.selectbox("Filtrar Intervenção", lista_interv)
+
+    # Cópia formatada (Texto BR) em cache por recorte
+    df_display_edit = display_frame(
+        f"{opts_key}:{uo_sel}", df_view, tuple(MONEY_COLS))
+    return df_view, df_display_edit, acao_sel, interv_sel
+
+
+def append_new_rows(df_to_save: pd.DataFrame, edited_df: pd.DataFrame,
+                    n_novas: int, n_base: int) -> pd.DataFrame:
+    """
+    Linhas adicionadas ficam no fim do retorno do editor; ganham rótulos
+    após o fim da planilha (`n_base`) para não colidir com os atuais.
+    """
+    novas = edited_df.iloc[len(edited_df) - n_novas:].copy()
+    for col in MONEY_COLS:
+        if col in novas.columns:
+            novas[col] = parse_brl_series(novas[col])
+    novas.index = pd.RangeIndex(n_base, n_base + n_novas)
+    return pd.concat([df_to_save, novas])
+
+
+def build_final_df(
+    data_raw: pd.DataFrame, df_edit: pd.DataFrame,
+    validated_df: pd.DataFrame, edits: dict,
+) -> pd.DataFrame:
+    """
+    Parte da planilha bruta (uma cópia) e atualiza no lugar só as células
+    editadas; exclusões e linhas novas só custam drop/concat quando existem.
+    """
+    final_df = data_raw.reindex(columns=ALL_COLS)
+    for pos, changes in edits.get("edited_rows", {}).items():
+        label = df_edit.index[int(pos)]
+        if label not in validated_df.index:
+            continue  # linha editada e depois excluída
+        for c in changes:
+            if c in final_df.columns:
+                final_df.at[label, c] = validated_df.at[label, c]
+    removidas = df_edit.index.difference(validated_df.index)
+    if len(removidas):
+        final_df = final_df.drop(index=removidas)
+    mask_novas = ~validated_df.index.isin(df_edit.index)
+    if mask_novas.any():
+        final_df = pd.concat(
+            [final_df, validated_df.loc[mask_novas, ALL_COLS]],
+            ignore_index=True)
+    return final_df
+
+
+def save_cronograma(data_raw: pd.DataFrame, df_view: pd.DataFrame,
+                    df_edit: pd.DataFrame, edited_df: pd.DataFrame) -> None:
+    """Valida as edições do editor e grava na planilha (rerun ao concluir)."""
+    # Parte dos valores originais (numéricos) e aplica só o diff
+    # do editor: nada de reconverter o frame inteiro de Texto BR
+    edits = st.session_state.get("editor_cronograma", {})
+    df_before_save = df_view.loc[df_edit.index]
+    df_to_save = apply_editor_edits(df_before_save, edits, MONEY_COLS)
+
+    n_novas = len(edits.get("added_rows", []))
+    if n_novas:
+        df_to_save = append_new_rows(
+            df_to_save, edited_df, n_novas, len(data_raw))
+
+    is_valid, msg, validated_df = validate_new_rows(
+        df_before_save, df_to_save, allowed_uos, is_admin, working_uo)
+
+    if not is_valid:
+        st.error(f"Erro: {msg}")
+        return
     try:
-        data_raw = conn.read(spreadsheet=spreadsheet,
-                             worksheet=worksheet, ttl=5)
-        # Normalização rigorosa para Checkboxes
-        data = normalize_dataframe(data_raw)
+        final_df = build_final_df(data_raw, df_edit, validated_df, edits)
+        update_sheet(conn, spreadsheet, worksheet, data_raw, final_df)
+        clear_sheet_cache()
+        st.toast("✅ Salvo com sucesso!", icon="💾")
+        time.sleep(1)
+        st.rerun()
+    except Exception as e:
+        st.error(f"Erro ao salvar no Google Sheets: {e}")
+
+
+def render_cronograma_editor(
+    data_raw: pd.DataFrame, df_view: pd.DataFrame,
+    df_display_edit: pd.DataFrame, acao_sel: str, interv_sel: str,
+) -> None:
+    """Modo de edição do recorte por Ação/Intervenção e botão de salvar."""
+    # Ação e Intervenção numa única máscara: um só recorte do frame
+    mask = np.ones(len(df_display_edit), dtype=bool)
+    if acao_sel != "Todas":
+        mask &= df_display_edit["acao_desc"].eq(acao_sel).to_numpy()
+    if interv_sel != "Todas":
+        mask &= df_display_edit["intervencao_desc"].eq(interv_sel).to_numpy()
+    # O recorte booleano já é um frame novo: sem .copy() extra
+    df_edit = df_display_edit.loc[mask]
+
+    st.caption("Modo de Edição Ativo")
+
+    edit_column_config = {
+        **cronograma_column_config(),
+        "uo_cod": st.column_config.NumberColumn(
+            "UO", disabled=not is_admin, format="%d"),
+    }
+
+    if not is_admin and "uo_cod" in df_edit.columns:
+        df_edit = df_edit.assign(uo_cod=int(working_uo))
+
+    edited_df = st.data_editor(
+        df_edit,
+        num_rows="dynamic",
+        use_container_width=True,
+        column_config=edit_column_config,
+        disabled=READONLY_COLS_DYNAMIC,
+        key="editor_cronograma"
+    )
+
+    if st.button("💾 Salvar Alterações", type="primary"):
+        save_cronograma(data_raw, df_view, df_edit, edited_df)
+
+
+@st.fragment
+def render_cronograma() -> None:
+    """
+    Cronograma físico isolado num fragmento: filtros e editor reexecutam só
+    este trecho, sem refazer métricas nem o detalhamento financeiro.
+    O salvamento chama st.rerun() (escopo app) para atualizar a página toda.
+    """
+    try:
+        # Normalização rigorosa para Checkboxes (em cache junto com a leitura)
+        data_raw, data, sheet_version = load_sheet(conn, spreadsheet, worksheet)
 
         if not is_admin:
-            data = data[pd.to_numeric(
-                data["uo_cod"], errors="coerce").fillna(-1).astype(int) == int(working_uo)].copy()
+            data = data.loc[data["uo_cod"].to_numpy(
+                dtype="int64", na_value=-1) == int(working_uo)]
 
         st.subheader("Cronograma de Intervenções")
 
         # Filtros
-        c_f1, c_f2, c_f3 = st.columns(3)
-        with c_f1:
-            lista_uos = ["Todas"] + \
-                sorted(data["uo_sigla"].dropna().unique().tolist())
-            uo_sel = st.selectbox("Filtrar UO", lista_uos)
-
-        df_view = data.copy()
-        if uo_sel != "Todas":
-            df_view = df_view[df_view["uo_sigla"] == uo_sel]
-
-        with c_f2:
-            lista_acoes = ["Todas"] + \
-                sorted(df_view["acao_desc"].dropna().unique().tolist())
-            acao_sel = st.selectbox("Filtrar Ação", lista_acoes)
-        with c_f3:
-            lista_interv = [
-                "Todas"] + sorted(df_view["intervencao_desc"].dropna().unique().tolist())
-            interv_sel = st.selectbox("Filtrar Intervenção", lista_interv)
-
-        # Prepara colunas monetárias para edição (Float -> Texto BR)
-        money_cols = ["valor_previsto_total", "valor_replanejado_total"]
-        for i in range(1, 7):
-            money_cols.append(f"{i}_bimestre_replanejado")
-            money_cols.append(f"{i}_bimestre_realizado")
-
-        df_display_edit = df_view.copy()
-        for col in money_cols:
-            if col in df_display_edit.columns:
-                df_display_edit[col] = df_display_edit[col].apply(
-                    format_brl_edit)
-
-        # --- CONFIGURAÇÃO DE COLUNAS ---
-        base_column_config = {
-            "uo_cod": st.column_config.NumberColumn("UO", format="%d"),
-            "uo_sigla": st.column_config.TextColumn("UO Sigla"),
-            "acao_cod": st.column_config.NumberColumn("Ação", format="%d"),
-            "acao_desc": st.column_config.TextColumn("Ação Desc."),
-            "intervencao_cod": None,  # Oculto
-            "intervencao_desc": st.column_config.TextColumn("Intervenção"),
-            "marcos_principais": st.column_config.TextColumn("Marcos Principais"),
-            "novo_marco": st.column_config.CheckboxColumn("Novo Marco?", default=False),
-            "valor_previsto_total": st.column_config.TextColumn("Valor Plano Total", disabled=True),
-            "valor_replanejado_total": st.column_config.TextColumn("Valor Plano Replanejado"),
-        }
-
-        for i in range(1, 7):
-            # Planejado -> Checkbox
-            base_column_config[f"{i}_bimestre_planejado"] = st.column_config.CheckboxColumn(
-                f"{i}ºb Plano",
-                default=False
-            )
-            # Replanejado/Realizado -> Texto BR
-            base_column_config[f"{i}_bimestre_replanejado"] = st.column_config.TextColumn(
-                f"{i}ºb Replanejado")
-            base_column_config[f"{i}_bimestre_realizado"] = st.column_config.TextColumn(
-                f"{i}ºb Realizado")
+        df_view, df_display_edit, acao_sel, interv_sel = cronograma_filters(
+            data, sheet_version)
 
         # --- RENDERIZAÇÃO ---
         if acao_sel == "Todas" and interv_sel == "Todas":
@@ -391,70 +389,22 @@ else:
                 df_display_edit,
                 use_container_width=True,
                 hide_index=True,
-                column_config=base_column_config
+                # --- CONFIGURAÇÃO DE COLUNAS --- (constante, montada uma vez)
+                column_config=cronograma_column_config()
             )
         else:
-            df_edit = df_display_edit.copy()
-            if acao_sel != "Todas":
-                df_edit = df_edit[df_edit["acao_desc"] == acao_sel]
-            if interv_sel != "Todas":
-                df_edit = df_edit[df_edit["intervencao_desc"] == interv_sel]
-
-            st.caption("Modo de Edição Ativo")
-
-            edit_column_config = base_column_config.copy()
-            edit_column_config["uo_cod"] = st.column_config.NumberColumn(
-                "UO", disabled=not is_admin, format="%d")
-
-            if not is_admin and "uo_cod" in df_edit.columns:
-                df_edit["uo_cod"] = int(working_uo)
-
-            cols_disabled = [c for c in ALL_COLS if (
-                c not in EDITABLE_COLS and c != "novo_marco")]
-
-            edited_df = st.data_editor(
-                df_edit,
-                num_rows="dynamic",
-                use_container_width=True,
-                column_config=edit_column_config,
-                disabled=cols_disabled,
-                key="editor_cronograma"
-            )
-
-            if st.button("💾 Salvar Alterações", type="primary"):
-                # Conversão inversa (Texto BR -> Float)
-                df_to_save = edited_df.copy()
-                for col in money_cols:
-                    if col in df_to_save.columns:
-                        df_to_save[col] = df_to_save[col].apply(parse_brl_edit)
-
-                df_before_save = df_edit.copy()
-                for col in money_cols:
-                    if col in df_before_save.columns:
-                        df_before_save[col] = df_before_save[col].apply(
-                            parse_brl_edit)
-
-                is_valid, msg, validated_df = validate_new_rows(
-                    df_before_save, df_to_save, allowed_uos, is_admin, working_uo)
-
-                if not is_valid:
-                    st.error(f"Erro: {msg}")
-                else:
-                    try:
-                        mask_drop = data_raw.index.isin(df_edit.index)
-                        final_df = pd.concat([data_raw[~mask_drop], validated_df], ignore_index=True)[
-                            ALL_COLS]
-                        conn.update(spreadsheet=spreadsheet,
-                                    worksheet=worksheet, data=final_df)
-                        st.toast("✅ Salvo com sucesso!", icon="💾")
-                        time.sleep(1)
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Erro ao salvar no Google Sheets: {e}")
+            render_cronograma_editor(
+                data_raw, df_view, df_display_edit, acao_sel, interv_sel)
 
     except Exception as e:
         st.error(f"Erro ao conectar no Google Sheets: {e}")
 
+
+if not spreadsheet:
+    st.warning("⚠️ Planilha não configurada nos secrets.")
+else:
+    render_cronograma()
+
 st.divider()
 
 # =============================================================================
@@ -462,25 +412,9 @@ st.divider()
 # =============================================================================
 st.subheader("Detalhamento Financeiro")
 
-view_option = st.radio(
-    "Selecione a base de dados para análise:",
-    options=["Execução do Exercício (2026)", "Restos a Pagar (RP)"],
-    horizontal=True,
-    label_visibility="visible"
-)
-
-restrict_uo_db = None if is_admin else int(working_uo)
-
-if view_option == "Execução do Exercício (2026)":
-    st.markdown("---")
-    st.markdown("#### 🟢 Tabela Dinâmica: Execução 2026")
-
-    with st.spinner("Carregando dados de execução..."):
-        df_exec = load_execucao_view(restrict_uo=restrict_uo_db)
-
-    st.caption("Filtro aplicado: (Fonte 89 ou IPU 0) e UO ≠ 1261")
-
-    DIM_OPTIONS_EXEC = {
+# Tabelas dinâmicas: opções de dimensões/medidas e widgets de cada base
+PIVOT_EXEC = {
+    "dims": {
         "Ano": "ano",
         "UO (cód.)": "uo_cod",
         "UO (sigla)": "uo_sigla",
@@ -494,90 +428,23 @@ if view_option == "Execução do Exercício (2026)":
         "Credor": "cnpj_cpf_formatado",
         "Nº Contrato": "num_contrato_saida",
         "Nº Empenho": "num_empenho"
-    }
-
-    MEASURE_OPTIONS_EXEC = {
+    },
+    "measures": {
         "Empenhado": "vlr_empenhado",
         "Liquidado": "vlr_liquidado",
         "Pago": "vlr_pago_orcamentario"
-    }
-
-    with st.expander("🛠️ Configurar Tabela (Execução)", expanded=True):
-        col_d, col_m = st.columns(2)
-        with col_d:
-            sel_dims_labels = st.multiselect(
-                "Agrupar por (Linhas):",
-                options=list(DIM_OPTIONS_EXEC.keys()),
-                default=["Ano", "UO (sigla)"],
-                key="multi_dims_exec"
-            )
-        with col_m:
-            sel_meas_labels = st.multiselect(
-                "Somar métricas (Colunas):",
-                options=list(MEASURE_OPTIONS_EXEC.keys()),
-                default=["Liquidado"],
-                key="multi_meas_exec"
-            )
-
-        c_o1, c_o2 = st.columns(2)
-        with c_o1:
-            use_brl = st.toggle("Formatar Moeda (R$)",
-                                value=True, key="toggle_brl_exec")
-        with c_o2:
-            remove_zero = st.toggle(
-                "Ocultar linhas zeradas", value=False, key="toggle_zero_exec")
-
-    if not sel_meas_labels:
-        st.warning("Selecione ao menos uma métrica para visualizar.")
-    else:
-        sel_dims = [DIM_OPTIONS_EXEC[L] for L in sel_dims_labels]
-        sel_meas = [MEASURE_OPTIONS_EXEC[L] for L in sel_meas_labels]
-
-        if not sel_dims:
-            agg_df = pd.DataFrame(df_exec[sel_meas].sum()).T
-        else:
-            agg_df = df_exec.groupby(sel_dims, dropna=False)[
-                sel_meas].sum().reset_index()
-
-        if remove_zero:
-            agg_df = agg_df.loc[agg_df[sel_meas].sum(axis=1) != 0]
-
-        if sel_dims:
-            agg_df = agg_df.sort_values(by=sel_dims)
-
-        display_df = agg_df.rename(columns={
-            **{v: k for k, v in DIM_OPTIONS_EXEC.items()},
-            **{v: k for k, v in MEASURE_OPTIONS_EXEC.items()}
-        })
-
-        if use_brl:
-            for lbl in sel_meas_labels:
-                if lbl in display_df.columns:
-                    display_df[lbl] = display_df[lbl].apply(brl)
-
-        st.dataframe(
-            display_df,
-            use_container_width=True,
-            hide_index=True,
-            column_config={"Ano": st.column_config.NumberColumn(format="%d")}
-        )
-
-        st.download_button(
-            "⬇️ Baixar CSV (Execução)",
-            data=agg_df.to_csv(index=False, sep=";",
-                               decimal=",").encode("utf-8-sig"),
-            file_name="execucao_2026.csv",
-            mime="text/csv"
-        )
-
-else:
-    st.markdown("---")
-    st.markdown("#### 🟠 Tabela Dinâmica: Restos a Pagar (RP)")
-
-    with st.spinner("Carregando Restos a Pagar..."):
-        df_rp = load_rp_view(restrict_uo=restrict_uo_db)
-
-    DIM_OPTIONS_RP = {
+    },
+    "title": "🛠️ Configurar Tabela (Execução)",
+    "default_dims": ["Ano", "UO (sigla)"],
+    "default_meas": ["Liquidado"],
+    "key": "exec",
+    "int_labels": ["Ano"],
+    "download_label": "⬇️ Baixar CSV (Execução)",
+    "file_name": "execucao_2026.csv",
+}
+
+PIVOT_RP = {
+    "dims": {
         "Ano Exercício": "ano",
         "Ano RP (Origem)": "ano_rp",
         "UO (cód.)": "uo_cod",
@@ -594,9 +461,8 @@ else:
         "Nº Obra": "num_obra",
         "Credor (CPF/CNPJ)": "cnpj_cpf_formatado",
         "Razão Social Credor": "razao_social_credor"
-    }
-
-    MEASURE_OPTIONS_RP = {
+    },
+    "measures": {
         "Inscrito (RPP)": "calc_inscrito_rpp",
         "Cancelado (RPP)": "calc_cancelado_rpp",
         "Pago (RPP)": "calc_pago_rpp",
@@ -606,75 +472,146 @@ else:
         "Liquidado (RPNP)": "calc_liquidado_rpnp",
         "Saldo (RPNP)": "calc_saldo_rpnp",
         "Pago (RPNP)": "calc_pago_rpnp"
-    }
-
-    with st.expander("🛠️ Configurar Tabela (RP)", expanded=True):
-        c_rp_d, c_rp_m = st.columns(2)
-        with c_rp_d:
-            sel_dims_rp_labels = st.multiselect(
+    },
+    "title": "🛠️ Configurar Tabela (RP)",
+    "default_dims": ["Ano RP (Origem)", "UO (sigla)"],
+    "default_meas": ["Pago (RPP)", "Pago (RPNP)"],
+    "key": "rp",
+    "int_labels": ["Ano Exercício", "Ano RP (Origem)"],
+    "download_label": "⬇️ Baixar CSV (Restos a Pagar)",
+    "file_name": "restos_a_pagar.csv",
+}
+
+
+def pivot_menu(spec: dict) -> tuple[list[str], list[str], bool, bool]:
+    """
+    Menu da tabela dinâmica: rótulos de linhas e métricas escolhidos e as
+    opções de formatação (moeda) e de ocultar linhas zeradas.
+    """
+    key = spec["key"]
+    with st.expander(spec["title"], expanded=True):
+        col_d, col_m = st.columns(2)
+        with col_d:
+            sel_dims_labels = st.multiselect(
                 "Agrupar por (Linhas):",
-                options=list(DIM_OPTIONS_RP.keys()),
-                default=["Ano RP (Origem)", "UO (sigla)"],
-                key="multi_dims_rp"
+                options=list(spec["dims"].keys()),
+                default=spec["default_dims"],
+                key=f"multi_dims_{key}"
             )
-        with c_rp_m:
-            sel_meas_rp_labels = st.multiselect(
+        with col_m:
+            sel_meas_labels = st.multiselect(
                 "Somar métricas (Colunas):",
-                options=list(MEASURE_OPTIONS_RP.keys()),
-                default=["Pago (RPP)", "Pago (RPNP)"],
-                key="multi_meas_rp"
+                options=list(spec["measures"].keys()),
+                default=spec["default_meas"],
+                key=f"multi_meas_{key}"
             )
 
-        c_rp_o1, c_rp_o2 = st.columns(2)
-        with c_rp_o1:
-            use_brl_rp = st.toggle("Formatar Moeda (R$)",
-                                   value=True, key="toggle_brl_rp")
-        with c_rp_o2:
-            remove_zero_rp = st.toggle(
-                "Ocultar linhas zeradas", value=False, key="toggle_zero_rp")
+        c_o1, c_o2 = st.columns(2)
+        with c_o1:
+            use_brl = st.toggle("Formatar Moeda (R$)",
+                                value=True, key=f"toggle_brl_{key}")
+        with c_o2:
+            remove_zero = st.toggle(
+                "Ocultar linhas zeradas", value=False, key=f"toggle_zero_{key}")
+    return sel_dims_labels, sel_meas_labels, use_brl, remove_zero
+
+
+def aggregate(df: pd.DataFrame, sel_dims: list[str], sel_meas: list[str],
+              remove_zero: bool) -> pd.DataFrame:
+    """Soma as métricas por dimensões (total geral se não houver linhas)."""
+    if not sel_dims:
+        agg_df = pd.DataFrame(df[sel_meas].sum()).T
+    else:
+        agg_df = df.groupby(sel_dims, dropna=False, observed=True,
+                            sort=False)[
+            sel_meas].sum().reset_index()
 
-    if not sel_meas_rp_labels:
+    if remove_zero:
+        agg_df = agg_df.loc[agg_df[sel_meas].sum(axis=1) != 0]
+
+    if sel_dims:
+        agg_df = agg_df.sort_values(by=sel_dims)
+    return agg_df
+
+
+def render_pivot(df: pd.DataFrame, spec: dict) -> None:
+    """Tabela dinâmica de uma base: menu, tabela agregada e download."""
+    sel_dims_labels, sel_meas_labels, use_brl, remove_zero = pivot_menu(spec)
+    if not sel_meas_labels:
         st.warning("Selecione ao menos uma métrica para visualizar.")
+        return
+
+    dim_opts, meas_opts = spec["dims"], spec["measures"]
+    agg_df = aggregate(df, [dim_opts[L] for L in sel_dims_labels],
+                       [meas_opts[L] for L in sel_meas_labels], remove_zero)
+
+    display_df = agg_df.rename(columns={
+        **{v: k for k, v in dim_opts.items()},
+        **{v: k for k, v in meas_opts.items()}
+    })
+
+    # Métricas seguem numéricas até o Arrow; o navegador formata (pt-BR)
+    column_config = {lbl: st.column_config.NumberColumn(format="%d")
+                     for lbl in spec["int_labels"]}
+    if use_brl:
+        for lbl in sel_meas_labels:
+            column_config[lbl] = st.column_config.NumberColumn(
+                f"{lbl} (R$)", format="localized")
+
+    st.dataframe(
+        display_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config
+    )
+
+    # CSV gerado só no clique (callable): o rerun não serializa nada
+    st.download_button(
+        spec["download_label"],
+        data=partial(to_csv_bytes, agg_df),
+        file_name=spec["file_name"],
+        mime="text/csv"
+    )
+
+
+@st.fragment
+def render_detalhamento() -> None:
+    """
+    Detalhamento financeiro (execução/RP) num fragmento próprio: toggle,
+    radio e configuração da tabela dinâmica não reexecutam o cronograma.
+    """
+    # Só carrega a execução/RP quando solicitado: mantém o CSV fora do rerun
+    # enquanto o usuário trabalha no cronograma.
+    if not st.toggle("Exibir detalhamento", value=False, key="toggle_detalhamento"):
+        st.caption("Ative para carregar as tabelas de execução e restos a pagar.")
+        return
+
+    view_option = st.radio(
+        "Selecione a base de dados para análise:",
+        options=["Execução do Exercício (2026)", "Restos a Pagar (RP)"],
+        horizontal=True,
+        label_visibility="visible"
+    )
+
+    restrict_uo_db = None if is_admin else int(working_uo)
+
+    if view_option == "Execução do Exercício (2026)":
+        st.markdown("---")
+        st.markdown("#### 🟢 Tabela Dinâmica: Execução 2026")
+
+        with st.spinner("Carregando dados de execução..."):
+            df_exec = load_execucao_view_cached(restrict_uo=restrict_uo_db)
+
+        st.caption("Filtro aplicado: (Fonte 89 ou IPU 0) e UO ≠ 1261")
+        render_pivot(df_exec, PIVOT_EXEC)
+
     else:
-        sel_dims_rp = [DIM_OPTIONS_RP[L] for L in sel_dims_rp_labels]
-        sel_meas_rp = [MEASURE_OPTIONS_RP[L] for L in sel_meas_rp_labels]
+        st.markdown("---")
+        st.markdown("#### 🟠 Tabela Dinâmica: Restos a Pagar (RP)")
 
-        if not sel_dims_rp:
-            agg_df_rp = pd.DataFrame(df_rp[sel_meas_rp].sum()).T
-        else:
-            agg_df_rp = df_rp.groupby(sel_dims_rp, dropna=False)[
-                sel_meas_rp].sum().reset_index()
-
-        if remove_zero_rp:
-            agg_df_rp = agg_df_rp.loc[agg_df_rp[sel_meas_rp].sum(axis=1) != 0]
-
-        if sel_dims_rp:
-            agg_df_rp = agg_df_rp.sort_values(by=sel_dims_rp)
-
-        display_df_rp = agg_df_rp.rename(columns={
-            **{v: k for k, v in DIM_OPTIONS_RP.items()},
-            **{v: k for k, v in MEASURE_OPTIONS_RP.items()}
-        })
-
-        if use_brl_rp:
-            for lbl in sel_meas_rp_labels:
-                if lbl in display_df_rp.columns:
-                    display_df_rp[lbl] = display_df_rp[lbl].apply(brl)
-
-        st.dataframe(
-            display_df_rp,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "Ano Exercício": st.column_config.NumberColumn(format="%d"),
-                "Ano RP (Origem)": st.column_config.NumberColumn(format="%d")
-            }
-        )
+        with st.spinner("Carregando Restos a Pagar..."):
+            df_rp = load_rp_view_cached(restrict_uo=restrict_uo_db)
+        render_pivot(df_rp, PIVOT_RP)
 
-        st.download_button(
-            "⬇️ Baixar CSV (Restos a Pagar)",
-            data=agg_df_rp.to_csv(index=False, sep=";",
-                                  decimal=",").encode("utf-8-sig"),
-            file_name="restos_a_pagar.csv",
-            mime="text/csv"
-        )
+
+render_detalhamento()
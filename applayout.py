@@ -11,22 +11,23 @@ Principais ajustes desta versão:
 
 from __future__ import annotations
 import time
-from collections.abc import Mapping
+from functools import partial
 import numpy as np
 import pandas as pd
 import streamlit as st
-import yaml
-from yaml.loader import SafeLoader
 from streamlit_gsheets import GSheetsConnection
 import streamlit_authenticator as stauth
 
 # ====== Módulos do projeto ======
 try:
-    from my_pkg.transform.metrics import load_metrics
-    from my_pkg.transform.execucao_view import load_execucao_view
-    from my_pkg.transform.rp_view import load_rp_view
-    from my_pkg.transform.schema import (
-        ALL_COLS, NUMERIC_COLS, BOOL_COLS, EDITABLE_COLS, REQUIRED_ON_NEW
+    from my_pkg.transform.schema import ALL_COLS, READONLY_COLS
+    from my_pkg.ui.common import (
+        brl, to_csv_bytes,
+        load_auth_from_secrets, hashed_credentials, resolve_allowed_uos,
+        validate_no_new_rows, apply_editor_edits,
+        load_sheet, clear_sheet_cache, filter_options, display_frame,
+        update_sheet, load_metrics_cached, load_execucao_view_cached,
+        load_rp_view_cached,
     )
 except ImportError:
     st.error("Erro: Módulos locais não encontrados.")
@@ -112,154 +113,52 @@ DISPLAY_LABELS = {
 PLANEJADO_KEYS = [f"{i}_bimestre_planejado" for i in range(1, 7)]
 PLANEJADO_LABELS = [DISPLAY_LABELS[k] for k in PLANEJADO_KEYS]
 
-# =============================================================================
-# Utilitários
-# =============================================================================
-
-
-def brl(value: float) -> str:
-    """Formata para visualização (KPIs)"""
-    if pd.isna(value):
-        return "R$ 0,00"
-    try:
-        return f"R$ {float(value):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except:
-        return "R$ 0,00"
-
-
-def format_brl_edit(value) -> str:
-    """Formata para o Editor (string)"""
-    if pd.isna(value) or value == "":
-        return ""
-    try:
-        val = float(value)
-        if val == 0:
-            return "R$ 0,00"
-        return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except (ValueError, TypeError):
-        return str(value)
-
-
-def parse_brl_edit(value_str) -> float:
-    """Converte string BRL de volta para float"""
-    if isinstance(value_str, (int, float)):
-        return float(value_str)
-    if pd.isna(value_str) or str(value_str).strip() == "":
-        return 0.0
-    clean = str(value_str).replace("R$", "").replace(
-        " ", "").replace(".", "").replace(",", ".")
-    try:
-        return float(clean)
-    except ValueError:
-        return 0.0
-
-
-def _to_plain_dict(obj):
-    if isinstance(obj, Mapping):
-        return {k: _to_plain_dict(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_to_plain_dict(x) for x in obj]
-    return obj
-
-
-def load_rbac_from_secrets() -> dict[str, list]:
-    raw = st.secrets.get("rbac", {})
-    out: dict[str, list] = {}
-    for user, lst in raw.items():
-        if isinstance(lst, list) and len(lst) == 1 and lst[0] == "*":
-            out[user] = ["*"]
-        else:
-            out[user] = list(map(int, lst))
-    return out
-
-
-def load_access_yaml(path: str = "security/access_control.yaml") -> dict[str, list]:
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.load(f, Loader=SafeLoader) or {}
-        users = data.get("users", {})
-        return {u: v.get("allowed_uos", []) for u, v in users.items()}
-    except FileNotFoundError:
-        return {}
-
-# =============================================================================
-# Normalização
-# =============================================================================
-
-
-def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """Normaliza dados (Numéricos e Booleanos para Checkbox)."""
-    data = df.copy()
-
-    for c in ALL_COLS:
-        if c not in data.columns:
-            data[c] = None
-
-    for col in NUMERIC_COLS:
-        if col in data.columns:
-            if data[col].dtype == object:
-                data[col] = (
-                    data[col].astype(str)
-                    .str.replace(r"\[R$\.\s\]", "", regex=True)
-                    .str.replace(",", ".")
-                )
-            data[col] = pd.to_numeric(data[col], errors="coerce").fillna(0.0)
-
-    # Códigos como inteiros (Int64)
-    CODE_COLS = ["uo_cod", "acao_cod", "intervencao_cod"]
-    for c in CODE_COLS:
-        if c in data.columns:
-            data[c] = pd.to_numeric(data[c], errors="coerce")
-            data[c] = data[c].round(0).astype("Int64")
-
-    # Tratamento Booleano Agressivo (Aceita X, SIM, TRUE)
-    TRUE_TOKENS = {"TRUE", "TRUE()", "1", "SIM", "S", "YES",
-                   "VERDADEIRO", "X", "OK", "V"}
-
-    # Colunas de Planejado
-    for col in PLANEJADO_KEYS:
-        if col in data.columns:
-            if data[col].dtype != bool:
-                data[col] = data[col].astype(
-                    str).str.strip().str.upper().isin(TRUE_TOKENS)
-            data[col] = data[col].astype(bool)
-
-    # Outros booleanos
-    other_bool_cols = list(set(BOOL_COLS) - set(PLANEJADO_KEYS))
-    for col in other_bool_cols:
-        if col in data.columns:
-            if data[col].dtype != bool:
-                data[col] = data[col].astype(
-                    str).str.strip().str.upper().isin(TRUE_TOKENS)
-            data[col] = data[col].astype(bool)
-
-    return data[ALL_COLS]
-
-
-def validate_no_new_rows(df_before, df_after) -> tuple[bool, str, pd.DataFrame]:
-    cols_key = ["uo_cod", "acao_cod", "intervencao_cod", "marcos_principais"]
-    before_idx = set(map(tuple, df_before[cols_key].astype(str).values))
-    after_idx = set(map(tuple, df_after[cols_key].astype(str).values))
-    new_keys = after_idx - before_idx
-    if new_keys:
-        return False, "Inclusão de novas linhas desabilitada.", df_after
-    return True, "", df_after
 
+@st.cache_resource(show_spinner=False)
+def cronograma_column_config() -> dict:
+    """
+    Configuração de colunas do Cronograma. Só depende de constantes: é
+    montada uma vez por processo (o Streamlit clona cada entrada ao usar).
+    """
+    cfg = {
+        "uo_cod": st.column_config.NumberColumn(DISPLAY_LABELS["uo_cod"], format="%d"),
+        "uo_sigla": st.column_config.TextColumn(DISPLAY_LABELS["uo_sigla"]),
+        "acao_cod": st.column_config.NumberColumn(DISPLAY_LABELS["acao_cod"], format="%d"),
+        "acao_desc": st.column_config.TextColumn(DISPLAY_LABELS["acao_desc"]),
+        "intervencao_cod": None,  # oculto
+        "intervencao_desc": st.column_config.TextColumn(DISPLAY_LABELS["intervencao_desc"]),
+        "marcos_principais": st.column_config.TextColumn(DISPLAY_LABELS["marcos_principais"]),
+        "novo_marco": st.column_config.CheckboxColumn(DISPLAY_LABELS["novo_marco"], default=False),
+        "valor_previsto_total": st.column_config.TextColumn(DISPLAY_LABELS["valor_previsto_total"], disabled=True),
+        "valor_replanejado_total": st.column_config.TextColumn(DISPLAY_LABELS["valor_replanejado_total"]),
+    }
+    for i in range(1, 7):
+        # Planejado = Checkbox
+        cfg[f"{i}_bimestre_planejado"] = st.column_config.CheckboxColumn(
+            DISPLAY_LABELS[f"{i}_bimestre_planejado"])
+        cfg[f"{i}_bimestre_replanejado"] = st.column_config.TextColumn(
+            DISPLAY_LABELS[f"{i}_bimestre_replanejado"])
+        cfg[f"{i}_bimestre_realizado"] = st.column_config.TextColumn(
+            DISPLAY_LABELS[f"{i}_bimestre_realizado"])
+    return cfg
 
 # =============================================================================
 # Autenticação
 # =============================================================================
-auth_cfg = _to_plain_dict(st.secrets.get("auth", {}))
-credentials = _to_plain_dict(auth_cfg.get("credentials", {}))
+auth_cfg = load_auth_from_secrets()
+credentials = auth_cfg.get("credentials", {})
 if "usernames" not in credentials:
     st.error("Erro na configuração de credenciais (secrets).")
     st.stop()
 
+# O Authenticate fica fora de cache: ele cria o CookieManager (componente
+# renderizado em cada sessão) e inicializa o session_state do login.
 auth = stauth.Authenticate(
-    credentials=credentials,
+    credentials=hashed_credentials(credentials),
     cookie_name=auth_cfg.get("cookie_name", "propag_monitoramento"),
     cookie_key=auth_cfg.get("cookie_key", "chave_secreta_padrao"),
     cookie_expiry_days=int(auth_cfg.get("cookie_expiry_days", 1)),
+    auto_hash=False,
 )
 
 # Login Centralizado
@@ -289,13 +188,7 @@ with st.sidebar:
     auth.logout(button_name="Sair", location="sidebar", key="logout_sidebar")
     st.divider()
 
-    rbac_secrets = load_rbac_from_secrets()
-    rbac_yaml = load_access_yaml()
-    allowed_uos_list = rbac_secrets.get(
-        username, []) or rbac_yaml.get(username, [])
-
-    is_admin = ("*" in allowed_uos_list)
-    allowed_uos = None if is_admin else set(map(int, allowed_uos_list))
+    is_admin, allowed_uos = resolve_allowed_uos(username)
 
     # Seleção de UO com suporte a "Todas" para quem tem múltiplas
     uo_selection_str = None
@@ -323,7 +216,7 @@ st.title("Propag - Monitoramento de Investimentos")
 
 # Carrega métricas (se necessário, filtre o df retornado por load_metrics se ele trouxer tudo)
 try:
-    vlr_plano, vlr_liq, saldo = load_metrics()
+    vlr_plano, vlr_liq, saldo = load_metrics_cached()
 except Exception as e:
     st.error(f"Erro ao carregar métricas: {e}")
     vlr_plano, vlr_liq, saldo = 0.0, 0.0, 0.0
@@ -348,101 +241,193 @@ worksheet = str(ss_cfg.get("worksheet", "Página1"))
 
 
 def style_view(df_labels: pd.DataFrame, planejado_labels: list[str], code_labels: list[str], colorir: bool = True) -> pd.io.formats.style.Styler:
-    styles = pd.DataFrame("", index=df_labels.index, columns=df_labels.columns)
-    if colorir:
-        # Se estiver usando o modo de visualização onde convertemos bool para "X"
-        for c in planejado_labels:
-            if c in df_labels.columns:
-                styles[c] = np.where(
-                    df_labels[c].astype(str).str.strip(
-                    ).str.upper().isin(["X", "TRUE"]),
-                    "background-color: #DFF6DD", ""
-                )
-    styler = df_labels.style.apply(lambda _: styles, axis=None)
-
-    def fmt_int(v):
-        try:
-            return f"{int(float(v))}" if pd.notna(v) and v != "" else ""
-        except:
-            return str(v)
-
-    fmt_map = {lbl: fmt_int for lbl in code_labels if lbl in df_labels.columns}
-    if fmt_map:
-        styler = styler.format(fmt_map)
+    styler = df_labels.style
+    present = [c for c in planejado_labels if c in df_labels.columns]
+    if colorir and present:
+        # Modo de visualização: Planejado já chega canônico ("X" ou ""), então
+        # basta uma comparação direta. Estilo só para essas colunas (subset)
+        def _col(s: pd.Series) -> np.ndarray:
+            return np.where(s.to_numpy() == "X", "background-color: #DFF6DD", "")
+        styler = styler.apply(_col, subset=present, axis=0)
+
+    # Códigos já são inteiros (normalize_dataframe): formatador nativo do
+    # Styler, sem função Python própria chamada célula a célula
+    code_cols = [lbl for lbl in code_labels if lbl in df_labels.columns]
+    if code_cols:
+        styler = styler.format(precision=0, na_rep="", subset=code_cols)
     return styler
 
 
-if not spreadsheet:
-    st.warning("⚠️ Planilha não configurada.")
-else:
+# Recarregar fica fora do fragmento: a sidebar não pode ser escrita de
+# dentro de um st.fragment (e o clique deve reexecutar o app inteiro).
+if spreadsheet and st.sidebar.button("🔄 Recarregar dados"):
+    clear_sheet_cache()
+
+# Colunas monetárias do cronograma (Texto BR na exibição/edição)
+MONEY_COLS = ["valor_previsto_total", "valor_replanejado_total"] + [
+    f"{i}_bimestre_{k}" for i in range(1, 7)
+    for k in ("replanejado", "realizado")
+]
+
+
+def restrict_to_selected_uo(data: pd.DataFrame) -> pd.DataFrame:
+    """Filtra os dados conforme seleção da Sidebar (Single ou Multi/Todas)."""
+    if is_admin:
+        return data
+    if uo_selection_str == "Todas":
+        # Filtra onde uo_cod está na lista permitida
+        return data.loc[data["uo_cod"].isin(allowed_uos)]
+    # Filtra pela UO específica selecionada (uo_cod já é inteiro)
+    return data.loc[data["uo_cod"].to_numpy(
+        dtype="int64", na_value=-1) == int(uo_selection_str)]
+
+
+def cronograma_filters(
+    data: pd.DataFrame, sheet_version: str
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Filtros internos da tabela. Devolve o recorte por UO (`df_view`) e a
+    sua cópia formatada para exibição (Texto BR), ambos em cache por recorte.
+    """
+    # Chave dos caches derivados: identifica leitura e recorte sem hashear o frame
+    opts_key = (f"{username}:{spreadsheet}:{worksheet}:{sheet_version}:"
+                f"{uo_selection_str}")
+    f1, f2, f3 = st.columns(3)
+    with f1:
+        lista_uos = ["Todas"] + \
+            filter_options(opts_key, data, ("uo_sigla",))["uo_sigla"]
+        uo_sel = st.selectbox("Filtrar UO", lista_uos)
+    # Recorte por UO direto sobre `data` (a cópia para exibição vem abaixo)
+    df_view = data
+    if uo_sel != "Todas":
+        df_view = data.loc[data["uo_sigla"].eq(uo_sel).to_numpy()]
+
+    opts = filter_options(f"{opts_key}:{uo_sel}", df_view,
+                          ("acao_desc", "intervencao_desc"))
+    with f2:
+        lista_acoes = ["Todas"] + opts["acao_desc"]
+        st.selectbox("Filtrar Ação", lista_acoes)
+    with f3:
+        lista_interv = ["Todas"] + opts["intervencao_desc"]
+        st.selectbox("Filtrar Intervenção", lista_interv)
+
+    # Cópia formatada (Texto BR) em cache por recorte
+    df_display = display_frame(
+        f"{opts_key}:{uo_sel}", df_view, tuple(MONEY_COLS))
+    return df_view, df_display
+
+
+def render_cronograma_view(df_display: pd.DataFrame) -> None:
+    """Modo Leitura: Planejado como "X" com fundo verde (Styler)."""
+    view_df = df_display.drop(columns=["intervencao_cod"], errors="ignore")
+
+    # Converte Bool para "X" apenas para visualização colorida.
+    # Invariante usada por style_view: Planejado fica só "X" ou ""
+    for c in PLANEJADO_KEYS:
+        if c in view_df.columns:
+            view_df[c] = np.where(view_df[c].eq(True), "X", "")
+
+    view_df = view_df.rename(columns=DISPLAY_LABELS)
+    CODE_LABELS_VIEW = ["UO", "Ação"]
+
+    # Aplica cor verde onde tem "X"
+    styled = style_view(view_df, PLANEJADO_LABELS,
+                        CODE_LABELS_VIEW, colorir=True)
+    st.dataframe(styled, use_container_width=True, hide_index=True)
+
+
+def build_final_df(
+    data_raw: pd.DataFrame, df_edit: pd.DataFrame,
+    validated_df: pd.DataFrame, edits: dict,
+) -> pd.DataFrame:
+    """
+    Sem inclusões nem exclusões (num_rows="fixed" e validate_no_new_rows):
+    parte da planilha bruta e atualiza no lugar só as células editadas.
+    """
+    final_df = data_raw.reindex(columns=ALL_COLS)
+    for pos, changes in edits.get("edited_rows", {}).items():
+        label = df_edit.index[int(pos)]
+        for c in changes:
+            if c in final_df.columns:
+                final_df.at[label, c] = validated_df.at[label, c]
+    return final_df
+
+
+def save_cronograma(
+    data_raw: pd.DataFrame, df_view: pd.DataFrame, df_edit: pd.DataFrame
+) -> None:
+    """Valida as edições do editor e grava na planilha (rerun ao concluir)."""
+    # Valores originais + só as células alteradas no editor
+    # (Texto BR -> Float apenas nas monetárias editadas)
+    edits = st.session_state.get("editor_cronograma", {})
+    df_before_save = df_view.loc[df_edit.index]
+    df_to_save = apply_editor_edits(df_before_save, edits, MONEY_COLS)
+
+    # Checkbox Bool -> Mantém Bool
+    # (Não precisa converter para X aqui, salvamos como TRUE/FALSE no sheets)
+
+    is_valid, msg, validated_df = validate_no_new_rows(
+        df_before_save, df_to_save)
+    if not is_valid:
+        st.error(f"Erro: {msg}")
+        return
     try:
-        data_raw = conn.read(spreadsheet=spreadsheet,
-                             worksheet=worksheet, ttl=5)
-        data = normalize_dataframe(data_raw)
-
-        # Filtra dados conforme seleção da Sidebar (Single ou Multi/Todas)
-        if not is_admin:
-            if uo_selection_str == "Todas":
-                # Filtra onde uo_cod está na lista permitida
-                data = data[data["uo_cod"].isin(allowed_uos)].copy()
-            else:
-                # Filtra pela UO específica selecionada
-                data = data[pd.to_numeric(
-                    data["uo_cod"], errors="coerce").fillna(-1).astype(int) == int(uo_selection_str)].copy()
+        final_df = build_final_df(data_raw, df_edit, validated_df, edits)
+        update_sheet(conn, spreadsheet, worksheet, data_raw, final_df)
+        clear_sheet_cache()
+        st.toast("✅ Salvo com sucesso!", icon="💾")
+        time.sleep(1)
+        st.rerun()
+    except Exception as e:
+        st.error(f"Erro ao salvar: {e}")
 
-        st.subheader("Cronograma de Intervenções")
 
-        # Filtros Internos da Tabela
-        f1, f2, f3 = st.columns(3)
-        with f1:
-            lista_uos = ["Todas"] + \
-                sorted(data["uo_sigla"].dropna().unique().tolist())
-            uo_sel = st.selectbox("Filtrar UO", lista_uos)
-        df_view = data.copy()
-        if uo_sel != "Todas":
-            df_view = df_view[df_view["uo_sigla"] == uo_sel]
-
-        with f2:
-            lista_acoes = ["Todas"] + \
-                sorted(df_view["acao_desc"].dropna().unique().tolist())
-            acao_sel = st.selectbox("Filtrar Ação", lista_acoes)
-        with f3:
-            lista_interv = [
-                "Todas"] + sorted(df_view["intervencao_desc"].dropna().unique().tolist())
-            interv_sel = st.selectbox("Filtrar Intervenção", lista_interv)
-
-        # Formatação Monetária
-        money_cols = ["valor_previsto_total", "valor_replanejado_total"]
-        for i in range(1, 7):
-            money_cols += [f"{i}_bimestre_replanejado",
-                           f"{i}_bimestre_realizado"]
-
-        df_display = df_view.copy()
-        for col in money_cols:
-            if col in df_display.columns:
-                df_display[col] = df_display[col].apply(format_brl_edit)
-
-        # Configuração de Colunas
-        base_column_config = {
-            "uo_cod": st.column_config.NumberColumn(DISPLAY_LABELS["uo_cod"], format="%d"),
-            "uo_sigla": st.column_config.TextColumn(DISPLAY_LABELS["uo_sigla"]),
-            "acao_cod": st.column_config.NumberColumn(DISPLAY_LABELS["acao_cod"], format="%d"),
-            "acao_desc": st.column_config.TextColumn(DISPLAY_LABELS["acao_desc"]),
-            "intervencao_cod": None,  # oculto
-            "intervencao_desc": st.column_config.TextColumn(DISPLAY_LABELS["intervencao_desc"]),
-            "marcos_principais": st.column_config.TextColumn(DISPLAY_LABELS["marcos_principais"]),
-            "novo_marco": st.column_config.CheckboxColumn(DISPLAY_LABELS["novo_marco"], default=False),
-            "valor_previsto_total": st.column_config.TextColumn(DISPLAY_LABELS["valor_previsto_total"], disabled=True),
-            "valor_replanejado_total": st.column_config.TextColumn(DISPLAY_LABELS["valor_replanejado_total"]),
-        }
-        for i in range(1, 7):
-            # Planejado = Checkbox
-            base_column_config[f"{i}_bimestre_planejado"] = st.column_config.CheckboxColumn(
-                DISPLAY_LABELS[f"{i}_bimestre_planejado"])
-            base_column_config[f"{i}_bimestre_replanejado"] = st.column_config.TextColumn(
-                DISPLAY_LABELS[f"{i}_bimestre_replanejado"])
-            base_column_config[f"{i}_bimestre_realizado"] = st.column_config.TextColumn(
-                DISPLAY_LABELS[f"{i}_bimestre_realizado"])
+def render_cronograma_editor(
+    data_raw: pd.DataFrame, df_view: pd.DataFrame, df_display: pd.DataFrame
+) -> None:
+    """Modo Edição: Checkboxes Reais e botão de salvar."""
+    # Um único recorte (sem cópia do frame: o data_editor não o altera)
+    if "novo_marco" in df_display.columns:
+        df_edit = df_display.loc[
+            df_display["novo_marco"].eq(False).to_numpy()]
+    else:
+        df_edit = df_display
+
+    st.caption("Edição: Planejado é fixo.")
+    # Configuração de Colunas (constante, montada uma vez); UO desabilitada
+    # se não for admin (única entrada por usuário)
+    edit_cfg = {**cronograma_column_config(),
+                "uo_cod": st.column_config.NumberColumn(
+                    DISPLAY_LABELS["uo_cod"], disabled=not is_admin,
+                    format="%d")}
+
+    # Resultado lido do session_state (diff de edições) ao salvar
+    st.data_editor(
+        df_edit,
+        num_rows="fixed",
+        use_container_width=True,
+        column_config=edit_cfg,
+        disabled=READONLY_COLS,  # inclui Planejado e novo_marco
+        key="editor_cronograma"
+    )
+
+    if st.button("💾 Salvar Alterações", type="primary"):
+        save_cronograma(data_raw, df_view, df_edit)
+
+
+@st.fragment
+def render_cronograma() -> None:
+    """
+    Cronograma físico isolado num fragmento: filtros e editor reexecutam só
+    este trecho, sem refazer métricas nem o detalhamento financeiro.
+    O salvamento chama st.rerun() (escopo app) para atualizar a página toda.
+    """
+    try:
+        data_raw, data, sheet_version = load_sheet(conn, spreadsheet, worksheet)
+        data = restrict_to_selected_uo(data)
+
+        st.subheader("Cronograma de Intervenções")
+        df_view, df_display = cronograma_filters(data, sheet_version)
 
         # ===================== VISUALIZAÇÃO / EDIÇÃO =====================
         st.markdown("#### Exibição / Edição")
@@ -450,89 +435,19 @@ else:
             "Editar dados (apenas Replanejado/Realizado)", value=False)
 
         if not editar:
-            # Modo Leitura: Convertemos Boolean para "X" para usar estilo visual se quiser,
-            # ou mantemos Checkbox. O script anterior usava Styler com "X".
-            # Vou manter a lógica visual pedida anteriormente: "X" com fundo verde.
-
-            view_df = df_display.drop(
-                columns=["intervencao_cod"], errors="ignore").copy()
-
-            # Converte Bool para "X" apenas para visualização colorida
-            for c in PLANEJADO_KEYS:
-                if c in view_df.columns:
-                    view_df[c] = view_df[c].apply(
-                        lambda x: "X" if x is True else "")
-
-            view_df = view_df.rename(columns=DISPLAY_LABELS)
-            CODE_LABELS_VIEW = ["UO", "Ação"]
-
-            # Aplica cor verde onde tem "X"
-            styled = style_view(view_df, PLANEJADO_LABELS,
-                                CODE_LABELS_VIEW, colorir=True)
-            st.dataframe(styled, use_container_width=True, hide_index=True)
-
+            render_cronograma_view(df_display)
         else:
-            # Modo Edição: Checkboxes Reais
-            df_edit = df_display.copy()
-            if "novo_marco" in df_edit.columns:
-                df_edit = df_edit[df_edit["novo_marco"] == False].copy()
-
-            st.caption("Edição: Planejado é fixo.")
-            edit_cfg = base_column_config.copy()
-            # UO desabilitada se não for admin
-            edit_cfg["uo_cod"] = st.column_config.NumberColumn(
-                DISPLAY_LABELS["uo_cod"], disabled=not is_admin, format="%d")
-
-            cols_disabled = [c for c in ALL_COLS if (
-                c not in EDITABLE_COLS and c != "novo_marco")]
-            cols_disabled = sorted(set(cols_disabled).union(
-                set(PLANEJADO_KEYS)).union({"novo_marco"}))
-
-            edited_df = st.data_editor(
-                df_edit,
-                num_rows="fixed",
-                use_container_width=True,
-                column_config=edit_cfg,
-                disabled=cols_disabled,
-                key="editor_cronograma"
-            )
-
-            if st.button("💾 Salvar Alterações", type="primary"):
-                df_to_save = edited_df.copy()
-                # Texto BR -> Float
-                for col in money_cols:
-                    if col in df_to_save.columns:
-                        df_to_save[col] = df_to_save[col].apply(parse_brl_edit)
-
-                # Checkbox Bool -> Mantém Bool
-                # (Não precisa converter para X aqui, salvamos como TRUE/FALSE no sheets)
-
-                df_before_save = df_edit.copy()
-                for col in money_cols:
-                    if col in df_before_save.columns:
-                        df_before_save[col] = df_before_save[col].apply(
-                            parse_brl_edit)
-
-                is_valid, msg, validated_df = validate_no_new_rows(
-                    df_before_save, df_to_save)
-                if not is_valid:
-                    st.error(f"Erro: {msg}")
-                else:
-                    try:
-                        mask_drop = data_raw.index.isin(df_edit.index)
-                        final_df = pd.concat([data_raw[~mask_drop], validated_df], ignore_index=True)[
-                            ALL_COLS]
-                        conn.update(spreadsheet=spreadsheet,
-                                    worksheet=worksheet, data=final_df)
-                        st.toast("✅ Salvo com sucesso!", icon="💾")
-                        time.sleep(1)
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Erro ao salvar: {e}")
+            render_cronograma_editor(data_raw, df_view, df_display)
 
     except Exception as e:
         st.error(f"Erro ao conectar no Google Sheets: {e}")
 
+
+if not spreadsheet:
+    st.warning("⚠️ Planilha não configurada.")
+else:
+    render_cronograma()
+
 st.divider()
 
 # =============================================================================
@@ -540,108 +455,132 @@ st.divider()
 # =============================================================================
 st.subheader("Execução da Despesa e Restos a Pagar")
 
-view_option = st.radio(
-    "Selecione a base de dados:",
-    options=["Execução do Exercício (2026)", "Restos a Pagar (RP)"],
-    horizontal=True
-)
+# Tabelas dinâmicas: opções de dimensões/medidas e chaves de cada base
+PIVOT_EXEC = {
+    "dims": {
+        "Ano": "ano", "UO (cód.)": "uo_cod", "UO (sigla)": "uo_sigla",
+        "Ação (cód.)": "acao_cod", "Ação (descrição)": "acao_desc",
+        "Grupo Despesa": "grupo_cod", "Fonte": "fonte_cod", "IPU": "ipu_cod",
+        "Credor": "cnpj_cpf_formatado", "Nº Contrato": "num_contrato_saida",
+        "Nº Empenho": "num_empenho",
+    },
+    "measures": {
+        "Empenhado": "vlr_empenhado", "Liquidado": "vlr_liquidado",
+        "Pago": "vlr_pago_orcamentario",
+    },
+    "default_dims": ["Ano", "UO (sigla)"],
+    "default_meas": ["Liquidado"],
+    "brl_key": None,
+    "int_labels": ["Ano"],
+    "file_name": "execucao.csv",
+}
+# (Configuração similar para RP - simplificada aqui para caber)
+PIVOT_RP = {
+    "dims": {"Ano Exercício": "ano",
+             "UO (sigla)": "uo_sigla", "Nº Contrato": "num_contrato_saida"},
+    "measures": {"Pago (RPP)": "calc_pago_rpp",
+                 "Pago (RPNP)": "calc_pago_rpnp"},
+    "default_dims": ["UO (sigla)"],
+    "default_meas": ["Pago (RPP)", "Pago (RPNP)"],
+    "brl_key": "rp_brl",
+    "int_labels": [],
+    "file_name": "rp.csv",
+}
 
-# Filtro do banco de dados baseado na seleção da Sidebar
-restrict_uo_db = None
-if not is_admin:
-    if uo_selection_str == "Todas":
-        # Se escolheu Todas, NÃO restringe na query (traz tudo) mas filtra depois
-        # Nota: load_execucao_view(None) carrega tudo. Precisamos filtrar o DF retornado.
-        restrict_uo_db = None
-    else:
-        restrict_uo_db = int(uo_selection_str)
 
-if view_option == "Execução do Exercício (2026)":
-    st.markdown("---")
-    with st.spinner("Carregando dados..."):
-        df_exec = load_execucao_view(restrict_uo=restrict_uo_db)
+def restrict_uo_db() -> int | None:
+    """
+    Filtro do banco de dados baseado na seleção da Sidebar. Com "Todas",
+    NÃO restringe na query (traz tudo): o DF é filtrado depois.
+    """
+    if is_admin or uo_selection_str == "Todas":
+        return None
+    return int(uo_selection_str)
 
-        # Filtro de Segurança Adicional (Caso tenha selecionado "Todas")
-        if not is_admin and uo_selection_str == "Todas":
-            df_exec = df_exec[df_exec["uo_cod"].isin(allowed_uos)]
 
-    st.caption("Filtro aplicado: (Fonte 89 ou IPU 0) e UO ≠ 1261")
+def only_allowed_uos(df: pd.DataFrame) -> pd.DataFrame:
+    """Filtro de Segurança Adicional (caso tenha selecionado "Todas")."""
+    if not is_admin and uo_selection_str == "Todas":
+        return df[df["uo_cod"].isin(allowed_uos)]
+    return df
 
-    DIM_OPTIONS_EXEC = {
-        "Ano": "ano", "UO (cód.)": "uo_cod", "UO (sigla)": "uo_sigla",
-        "Ação (cód.)": "acao_cod", "Ação (descrição)": "acao_desc",
-        "Grupo Despesa": "grupo_cod", "Fonte": "fonte_cod", "IPU": "ipu_cod",
-        "Credor": "cnpj_cpf_formatado", "Nº Contrato": "num_contrato_saida", "Nº Empenho": "num_empenho"
-    }
-    MEASURE_OPTIONS_EXEC = {
-        "Empenhado": "vlr_empenhado", "Liquidado": "vlr_liquidado", "Pago": "vlr_pago_orcamentario"
-    }
 
+def aggregate(df: pd.DataFrame, dims: list[str],
+              meas: list[str]) -> pd.DataFrame:
+    """Soma as medidas por dimensões (total geral se não houver linhas)."""
+    if not dims:
+        return pd.DataFrame(df[meas].sum()).T
+    return df.groupby(dims, dropna=False, observed=True, sort=False)[
+        meas].sum().reset_index().sort_values(by=dims)
+
+
+def render_pivot(df: pd.DataFrame, spec: dict) -> None:
+    """Menu de dimensões, tabela agregada e download de uma base."""
+    dim_opts, meas_opts = spec["dims"], spec["measures"]
     with st.expander("Menu de Dimensões", expanded=True):
         c1, c2 = st.columns(2)
         sel_dims = c1.multiselect("Linhas:", list(
-            DIM_OPTIONS_EXEC.keys()), default=["Ano", "UO (sigla)"])
+            dim_opts.keys()), default=spec["default_dims"])
         sel_meas = c2.multiselect("Colunas:", list(
-            MEASURE_OPTIONS_EXEC.keys()), default=["Liquidado"])
-        use_brl_toggle = st.toggle("Formatar Moeda (R$)", value=True)
-
-    if sel_meas:
-        dims = [DIM_OPTIONS_EXEC[L] for L in sel_dims]
-        meas = [MEASURE_OPTIONS_EXEC[L] for L in sel_meas]
-
-        if not dims:
-            agg = pd.DataFrame(df_exec[meas].sum()).T
-        else:
-            agg = df_exec.groupby(dims, dropna=False)[
-                meas].sum().reset_index().sort_values(by=dims)
-
-        display = agg.rename(columns={**{v: k for k, v in DIM_OPTIONS_EXEC.items()}, **{
-                             v: k for k, v in MEASURE_OPTIONS_EXEC.items()}})
+            meas_opts.keys()), default=spec["default_meas"])
+        use_brl = st.toggle("Formatar Moeda (R$)", value=True,
+                            key=spec["brl_key"])
+
+    if not sel_meas:
+        return
+    agg = aggregate(df, [dim_opts[L] for L in sel_dims],
+                    [meas_opts[L] for L in sel_meas])
+    display = agg.rename(columns={**{v: k for k, v in dim_opts.items()},
+                                  **{v: k for k, v in meas_opts.items()}})
+
+    # Métricas seguem numéricas até o Arrow; o navegador formata (pt-BR)
+    cfg = {lbl: st.column_config.NumberColumn(format="%d")
+           for lbl in spec["int_labels"]}
+    if use_brl:
+        for c in sel_meas:
+            cfg[c] = st.column_config.NumberColumn(
+                f"{c} (R$)", format="localized")
+
+    st.dataframe(display, use_container_width=True, hide_index=True,
+                 column_config=cfg)
+    # CSV gerado só no clique (callable): o rerun não serializa nada
+    st.download_button("⬇️ Baixar CSV", partial(to_csv_bytes, agg),
+                       spec["file_name"], mime="text/csv")
+
+
+@st.fragment
+def render_detalhamento() -> None:
+    """
+    Detalhamento financeiro (execução/RP) num fragmento próprio: toggle,
+    radio e configuração da tabela dinâmica não reexecutam o cronograma.
+    """
+    # Só carrega a execução/RP quando solicitado: mantém o CSV fora do rerun
+    # enquanto o usuário trabalha no cronograma.
+    if not st.toggle("Exibir detalhamento", value=False, key="toggle_detalhamento"):
+        st.caption("Ative para carregar as tabelas de execução e restos a pagar.")
+        return
+
+    view_option = st.radio(
+        "Selecione a base de dados:",
+        options=["Execução do Exercício (2026)", "Restos a Pagar (RP)"],
+        horizontal=True
+    )
 
-        if use_brl_toggle:
-            for c in sel_meas:
-                display[c] = display[c].apply(brl)
+    if view_option == "Execução do Exercício (2026)":
+        st.markdown("---")
+        with st.spinner("Carregando dados..."):
+            df_exec = only_allowed_uos(
+                load_execucao_view_cached(restrict_uo=restrict_uo_db()))
 
-        st.dataframe(display, use_container_width=True, hide_index=True, column_config={
-                     "Ano": st.column_config.NumberColumn(format="%d")})
-        st.download_button("⬇️ Baixar CSV", agg.to_csv(
-            index=False, sep=";", decimal=",").encode("utf-8-sig"), "execucao.csv")
+        st.caption("Filtro aplicado: (Fonte 89 ou IPU 0) e UO ≠ 1261")
+        render_pivot(df_exec, PIVOT_EXEC)
 
-else:
-    st.markdown("---")
-    with st.spinner("Carregando RP..."):
-        df_rp = load_rp_view(restrict_uo=restrict_uo_db)
-        if not is_admin and uo_selection_str == "Todas":
-            df_rp = df_rp[df_rp["uo_cod"].isin(allowed_uos)]
+    else:
+        st.markdown("---")
+        with st.spinner("Carregando RP..."):
+            df_rp = only_allowed_uos(
+                load_rp_view_cached(restrict_uo=restrict_uo_db()))
+        render_pivot(df_rp, PIVOT_RP)
 
-    # (Configuração similar para RP - simplificada aqui para caber)
-    DIM_RP = {"Ano Exercício": "ano",
-              "UO (sigla)": "uo_sigla", "Nº Contrato": "num_contrato_saida"}
-    MEAS_RP = {"Pago (RPP)": "calc_pago_rpp", "Pago (RPNP)": "calc_pago_rpnp"}
 
-    with st.expander("Menu de Dimensões", expanded=True):
-        c1, c2 = st.columns(2)
-        sel_dims_rp = c1.multiselect("Linhas:", list(
-            DIM_RP.keys()), default=["UO (sigla)"])
-        sel_meas_rp = c2.multiselect("Colunas:", list(
-            MEAS_RP.keys()), default=["Pago (RPP)", "Pago (RPNP)"])
-        use_brl_rp = st.toggle("Formatar Moeda (R$)", value=True, key="rp_brl")
-
-    if sel_meas_rp:
-        dims = [DIM_RP[L] for L in sel_dims_rp]
-        meas = [MEAS_RP[L] for L in sel_meas_rp]
-        if not dims:
-            agg = pd.DataFrame(df_rp[meas].sum()).T
-        else:
-            agg = df_rp.groupby(dims, dropna=False)[
-                meas].sum().reset_index().sort_values(by=dims)
-
-        disp = agg.rename(columns={
-                          **{v: k for k, v in DIM_RP.items()}, **{v: k for k, v in MEAS_RP.items()}})
-        if use_brl_rp:
-            for c in sel_meas_rp:
-                disp[c] = disp[c].apply(brl)
-
-        st.dataframe(disp, use_container_width=True, hide_index=True)
-        st.download_button("⬇️ Baixar CSV", agg.to_csv(
-            index=False, sep=";", decimal=",").encode("utf-8-sig"), "rp.csv")
+render_detalhamento()
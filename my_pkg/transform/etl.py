@@ -1,6 +1,7 @@
 import pandas as pd  # Biblioteca principal para manipular tabelas de dados
 import numpy as np   # Biblioteca para cálculos matemáticos avançados
 import os            # Biblioteca para comandos do sistema operacional (criar pastas)
+import gzip          # Biblioteca para ler arquivos compactados (.gz)
 import warnings      # Biblioteca para controlar avisos de erro
 from pathlib import Path # Biblioteca moderna para lidar com caminhos de arquivos de forma inteligente
 
@@ -28,6 +29,10 @@ PATH_OUT = PROJECT_ROOT / "processed_data"
 # Cria a pasta de saída (processed_data) se ela ainda não existir
 os.makedirs(PATH_OUT, exist_ok=True)
 
+# Tabela de tradução para valores em texto BR ("1.000,00" -> "1000.00"):
+# remove o ponto de milhar e troca a vírgula decimal numa única passada
+TRADUCAO_BRL = str.maketrans({'.': None, ',': '.'})
+
 # ==============================================================================
 # 1. FUNÇÃO DE LEITURA INTELIGENTE
 # ==============================================================================
@@ -52,6 +57,17 @@ def ler_csv_seguro(path, encoding='utf-8', compression=None):
     
     # Converte o caminho do arquivo para texto (o pandas precisa disso)
     path_str = str(path)
+
+    # Olha só o cabeçalho para decidir a ordem: evita ler (e descompactar) o
+    # arquivo inteiro com o separador errado antes de acertar
+    try:
+        abrir = gzip.open if compression == 'gzip' else open
+        with abrir(path_str, 'rt', encoding=encoding, errors='replace') as f:
+            cabecalho = f.readline()
+        if cabecalho.count(',') > cabecalho.count(';'):
+            separadores = [',', ';']
+    except OSError:
+        pass
     
     for sep in separadores:
         try:
@@ -59,15 +75,22 @@ def ler_csv_seguro(path, encoding='utf-8', compression=None):
             df = pd.read_csv(path_str, encoding=encoding, sep=sep, compression=compression, dtype=cols_str)
             
             # Verificação: Se o arquivo tiver só 1 coluna, provavelmente o separador está errado
-            if df.shape[1] <= 1 and sep == ';': 
-                continue # Pula para a próxima tentativa (vírgula)
+            if df.shape[1] <= 1 and sep != separadores[-1]: 
+                continue # Pula para a próxima tentativa (outro separador)
             
             # Limpeza 1: Padroniza os nomes das colunas (tudo minúsculo, sem espaços nas pontas)
             df.columns = [c.strip().lower() for c in df.columns]
             
             # Limpeza 2: Remove espaços em branco dentro das células de texto
+            # Colunas repetitivas (siglas, descrições): limpa só os valores
+            # distintos e redistribui pelos códigos do factorize
             for col in df.select_dtypes(include=['object']).columns:
-                df[col] = df[col].str.strip()
+                codigos, valores = pd.factorize(df[col])
+                if len(valores) < len(df) * 0.5:
+                    limpos = pd.Index(valores).str.strip()
+                    df[col] = limpos.take(codigos, allow_fill=True, fill_value=np.nan)
+                else:
+                    df[col] = df[col].str.strip()
             
             print(f"   [OK] Lido com sucesso: {path.name} ({len(df)} linhas)")
             return df # Retorna a tabela carregada
@@ -98,7 +121,7 @@ if 'limite_propag' in df_limites.columns:
 # Converte o valor para número (caso venha como texto "1.000,00")
 if not df_limites.empty and 'valor_limite' in df_limites.columns:
     if df_limites['valor_limite'].dtype == 'O': # 'O' significa Object (Texto)
-        df_limites['valor_limite'] = df_limites['valor_limite'].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        df_limites['valor_limite'] = df_limites['valor_limite'].astype(str).str.translate(TRADUCAO_BRL)
     df_limites['valor_limite'] = pd.to_numeric(df_limites['valor_limite'], errors='coerce').fillna(0)
 
 # --- CARREGA E TRATA A TABELA DE INTERVENÇÕES ---
@@ -108,7 +131,7 @@ df_intervencoes = ler_csv_seguro(PATH_RAW / "propag_investimentos_intervencoes_p
 # Garante que temos a coluna de valor
 if not df_intervencoes.empty and 'valor_plano' in df_intervencoes.columns:
     if df_intervencoes['valor_plano'].dtype == 'O':
-        df_intervencoes['valor_plano'] = df_intervencoes['valor_plano'].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        df_intervencoes['valor_plano'] = df_intervencoes['valor_plano'].astype(str).str.translate(TRADUCAO_BRL)
     df_intervencoes['valor_plano'] = pd.to_numeric(df_intervencoes['valor_plano'], errors='coerce').fillna(0)
 else:
     # Se não achar a coluna, cria ela com zeros para não travar o painel
@@ -132,12 +155,13 @@ def filtrar_propag(df):
     condicao = pd.Series(False, index=df.index)
     
     # Se tiver coluna IPU, marca Verdadeiro onde for 0
+    # (comparação numérica: '0', '00' e '000' viram 0 sem criar coluna de texto)
     if 'ipu_cod' in df.columns:
-        condicao = condicao | (df['ipu_cod'].astype(str).isin(['0', '00', '000']))
-    
+        condicao = condicao | (pd.to_numeric(df['ipu_cod'], errors='coerce') == 0)
+
     # Se tiver coluna Fonte, marca Verdadeiro onde for 89
     if 'fonte_cod' in df.columns:
-        condicao = condicao | (df['fonte_cod'].astype(str) == '89')
+        condicao = condicao | (pd.to_numeric(df['fonte_cod'], errors='coerce') == 89)
         
     # Retorna apenas as linhas que satisfazem a condição
     return df[condicao].copy()
@@ -154,33 +178,48 @@ print("3/5 - Calculando métricas matemáticas de Restos a Pagar...")
 
 if not df_rp.empty:
     # Garante que todas as colunas de valor (vlr_...) sejam números
+    # Já numéricas passam direto; só as de texto são convertidas. Todas
+    # voltam à tabela de uma vez, como um único bloco float64
     cols_vlr = [c for c in df_rp.columns if 'vlr_' in c]
-    for col in cols_vlr: 
-        df_rp[col] = pd.to_numeric(df_rp[col], errors='coerce').fillna(0)
+    bloco = np.column_stack([
+        pd.to_numeric(df_rp[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        for col in cols_vlr
+    ]) if cols_vlr else np.empty((len(df_rp), 0))
+    bloco[np.isnan(bloco)] = 0.0
+    df_rp[cols_vlr] = bloco
 
-    # Fórmula: Pago Processado
-    df_rp['rp_proc_pago'] = (
-        df_rp['vlr_pago_rpp'] - df_rp['vlr_anulacao_pagamento_rpp'] + 
-        df_rp['vlr_retencao_rpp'] - df_rp['vlr_anulacao_retencao_rpp']
-    )
-    
     # Garante coluna auxiliar
     if 'vlr_despesa_liquidada_pagar' not in df_rp.columns: 
-        df_rp['vlr_despesa_liquidada_pagar'] = 0
+        df_rp['vlr_despesa_liquidada_pagar'] = 0.0
+
+    # As fórmulas usam os arrays NumPy das colunas: a conta é feita direto
+    # nos números, sem alinhar índice a cada operação entre Series
+    v = {col: df_rp[col].to_numpy(dtype='float64') for col in (
+        'vlr_pago_rpp', 'vlr_anulacao_pagamento_rpp', 'vlr_retencao_rpp',
+        'vlr_anulacao_retencao_rpp', 'vlr_saldo_rpp',
+        'vlr_despesa_liquidada_rpnp', 'vlr_despesa_liquidada_pagar')}
+
+    # Fórmula: Pago Processado
+    rp_proc_pago = (
+        v['vlr_pago_rpp'] - v['vlr_anulacao_pagamento_rpp'] + 
+        v['vlr_retencao_rpp'] - v['vlr_anulacao_retencao_rpp']
+    )
+    df_rp['rp_proc_pago'] = rp_proc_pago
         
     # Fórmula: Liquidado Não Processado
-    df_rp['rp_nproc_liquidado'] = df_rp['vlr_despesa_liquidada_rpnp']
+    df_rp['rp_nproc_liquidado'] = v['vlr_despesa_liquidada_rpnp']
     
     # Fórmula: Pago Não Processado
-    df_rp['rp_nproc_pago'] = (
-        df_rp['vlr_saldo_rpp'] + 
-        df_rp['vlr_despesa_liquidada_rpnp'] - 
-        df_rp['vlr_despesa_liquidada_pagar']
+    rp_nproc_pago = (
+        v['vlr_saldo_rpp'] + 
+        v['vlr_despesa_liquidada_rpnp'] - 
+        v['vlr_despesa_liquidada_pagar']
     )
+    df_rp['rp_nproc_pago'] = rp_nproc_pago
     
     # Totalizadores usados no Painel
-    df_rp['vlr_liquidado_rp_total'] = df_rp['rp_nproc_liquidado'] 
-    df_rp['vlr_pago_rp_total'] = df_rp['rp_proc_pago'] + df_rp['rp_nproc_pago']
+    df_rp['vlr_liquidado_rp_total'] = v['vlr_despesa_liquidada_rpnp']
+    df_rp['vlr_pago_rp_total'] = rp_proc_pago + rp_nproc_pago
 else:
     # Se a tabela estiver vazia, zera os totais
     df_rp['vlr_liquidado_rp_total'] = 0
@@ -190,40 +229,51 @@ else:
 # ==============================================================================
 print("4/5 - Mapeando códigos de intervenção (Regras UO 1251 e 1301)...")
 
-def identificar_intervencao(row):
+# Mapa direto da regra da Saúde (UO 1301): Número da Obra -> Código da Intervenção
+MAPA_OBRAS_SAUDE = {
+    '12221': '130109', '12533': '130108', '12507': '130112', 
+    '8025': '130107', '12219': '130110', '11527': '130111'
+}
+
+def identificar_intervencao(df):
     """
-    Analisa cada linha de despesa e diz a qual intervenção ela pertence.
+    Analisa as linhas de despesa e diz a qual intervenção cada uma pertence.
+    Trabalha com a coluna inteira de uma vez (sem laço linha a linha).
     """
-    # Pega os valores da linha convertendo para texto seguro
-    uo = str(row.get('uo_cod', ''))
-    acao = str(row.get('acao_cod', ''))
-    item = str(row.get('elemento_item_cod', ''))
-    obra = str(row.get('num_obra', ''))
-    
+    # Pega as colunas como texto (coluna ausente = vazia). Os códigos já vêm
+    # como texto de ler_csv_seguro (cols_str, preserva zeros à esquerda):
+    # nesse caso compara direto, sem criar uma cópia convertida
+    def texto(col):
+        if col not in df.columns:
+            return pd.Series('', index=df.index)
+        if df[col].dtype == object:
+            return df[col]
+        return df[col].astype(str)
+
+    uo = texto('uo_cod')
+    acao = texto('acao_cod')
+    item = texto('elemento_item_cod')
     # Remove '.0' se o Excel tiver colocado (ex: '12221.0' -> '12221')
-    if obra.endswith('.0'): obra = obra[:-2]
-    
+    obra = texto('num_obra').str.removesuffix('.0')
+
+    # Regra Obras Específicas (UO 1301 - Saúde): só as obras do mapa
+    intervencao_saude = obra.map(MAPA_OBRAS_SAUDE)
+    regra_saude = uo.eq('1301') & acao.eq('1037') & intervencao_saude.notna()
+    resultado = np.where(regra_saude, intervencao_saude, None)
+
     # Regra DER MG (UO 1251)
-    if uo == '1251' and acao == '4365':
-        # Se o item for 5201 vai para uma, senão vai para outra
-        return '125102' if item == '5201' else '125101'
-        
-    # Regra Obras Específicas (UO 1301 - Saúde)
-    if uo == '1301' and acao == '1037':
-        # Mapa direto: Número da Obra -> Código da Intervenção
-        mapa = {
-            '12221': '130109', '12533': '130108', '12507': '130112', 
-            '8025': '130107', '12219': '130110', '11527': '130111'
-        }
-        if obra in mapa: return mapa[obra]
-        
-    return None # Se não cair em nenhuma regra, retorna vazio
+    # Se o item for 5201 vai para uma, senão vai para outra
+    regra_der = uo.eq('1251') & acao.eq('4365')
+    resultado = np.where(regra_der, np.where(item.eq('5201'), '125102', '125101'), resultado)
 
-# Aplica a função linha a linha (axis=1) se a tabela não estiver vazia
+    # Quem não cai em nenhuma regra fica vazio (None)
+    return pd.Series(resultado, index=df.index, dtype=object)
+
+# Aplica a regra na tabela inteira se ela não estiver vazia
 if not df_execucao.empty: 
-    df_execucao['intervencao_map'] = df_execucao.apply(identificar_intervencao, axis=1)
+    df_execucao['intervencao_map'] = identificar_intervencao(df_execucao)
 if not df_rp.empty: 
-    df_rp['intervencao_map'] = df_rp.apply(identificar_intervencao, axis=1)
+    df_rp['intervencao_map'] = identificar_intervencao(df_rp)
 
 # ==============================================================================
 # 6. GERAÇÃO DE TABELAS FINAIS (OUTPUT)
@@ -237,21 +287,20 @@ chaves = ['ano', 'uo_cod', 'fonte_cod', 'ipu_cod']
 # Garante que usamos apenas chaves que existem no arquivo de limites
 cols_join_lim = [c for c in chaves if c in df_limites.columns]
 
-# Agrupa Limites
-t_limite = df_limites.groupby(cols_join_lim, as_index=False)['valor_limite'].sum()
-
-# Agrupa Execução (Se vazia, cria tabela vazia estruturada)
-t_exec = df_execucao.groupby(chaves, as_index=False)['vlr_liquidado'].sum() if not df_execucao.empty else pd.DataFrame(columns=chaves)
-
-# Agrupa RP
-t_rp = df_rp.groupby(chaves, as_index=False)['vlr_liquidado_rp_total'].sum() if not df_rp.empty else pd.DataFrame(columns=chaves)
-
-# Junta Limites com Execução (Outer Join mantém quem tem limite mas não tem execução e vice-versa)
-df_visao = pd.merge(t_limite, t_exec, on=cols_join_lim, how='outer')
+# Empilha Limites, Execução e RP (só chaves + a métrica de cada um) e agrupa
+# uma única vez: uma chave que aparece em qualquer das bases vira linha, como
+# no outer join, e as métricas que ela não tem ficam vazias (NaN)
+partes = [df_limites[cols_join_lim + ['valor_limite']]]
+if not df_execucao.empty:
+    partes.append(df_execucao[cols_join_lim + ['vlr_liquidado']])
+if not df_rp.empty:
+    partes.append(df_rp[cols_join_lim + ['vlr_liquidado_rp_total']])
+empilhado = pd.concat(partes, ignore_index=True)
 
-# Junta com RP
-if not t_rp.empty: 
-    df_visao = pd.merge(df_visao, t_rp, on=cols_join_lim, how='outer')
+# min_count=1: grupo sem valor na métrica continua NaN (zerado logo abaixo)
+# observed=True: se alguma chave virar category, só combinações existentes.
+# A ordenação fica (é a ordem das linhas do CSV final).
+df_visao = empilhado.groupby(cols_join_lim, as_index=False, observed=True).sum(min_count=1)
 
 # Preenche vazios (NaN) com zero
 df_visao.fillna(0, inplace=True)
@@ -265,7 +314,10 @@ df_visao['vlr_liquidado_total'] = df_visao['vlr_liquidado'] + df_visao['vlr_liqu
 df_visao['saldo_limite'] = df_visao['valor_limite'] - df_visao['vlr_liquidado_total']
 
 # Adiciona a Sigla da UO para ficar legível
-mapa_siglas = df_uo.set_index('uo_cod')['uo_sigla'].to_dict() if not df_uo.empty else {}
+# (Series como mapa: o .map faz a busca em C, sem montar um dict Python;
+# keep='last' mantém a regra do dict antigo quando a UO se repete por ano)
+mapa_siglas = (df_uo.drop_duplicates('uo_cod', keep='last').set_index('uo_cod')['uo_sigla']
+               if not df_uo.empty else pd.Series(dtype=object))
 df_visao['uo_sigla'] = df_visao['uo_cod'].map(mapa_siglas)
 
 # Salva o arquivo final
@@ -285,8 +337,9 @@ else:
     df_rp['intervencao_temp'] = df_rp['intervencao_map'].fillna('SEM_REF')
 
 # Agrupa Execução e RP por Intervenção
-exec_int = df_execucao.groupby(['ano', 'uo_cod', 'acao_cod', 'intervencao_temp'], as_index=False)['vlr_liquidado'].sum() if not df_execucao.empty else pd.DataFrame()
-rp_int = df_rp.groupby(['ano', 'uo_cod', 'acao_cod', 'intervencao_temp'], as_index=False)['vlr_liquidado_rp_total'].sum() if not df_rp.empty else pd.DataFrame()
+# (sort=False: o outer merge logo abaixo já ordena as chaves do resultado)
+exec_int = df_execucao.groupby(['ano', 'uo_cod', 'acao_cod', 'intervencao_temp'], as_index=False, observed=True, sort=False)['vlr_liquidado'].sum() if not df_execucao.empty else pd.DataFrame()
+rp_int = df_rp.groupby(['ano', 'uo_cod', 'acao_cod', 'intervencao_temp'], as_index=False, observed=True, sort=False)['vlr_liquidado_rp_total'].sum() if not df_rp.empty else pd.DataFrame()
 
 # Junta Execução + RP
 total_int = pd.merge(exec_int, rp_int, on=['ano', 'uo_cod', 'acao_cod', 'intervencao_temp'], how='outer').fillna(0)
@@ -299,9 +352,9 @@ else:
 
 # Prepara a tabela de Metas (Limites das Intervenções)
 df_meta = df_intervencoes.rename(columns={'intervencao_cod': 'intervencao_temp'})
-# Limpa o código da intervenção (.0)
+# Limpa o código da intervenção (.0 no final, ex: '130109.0' -> '130109')
 if not df_meta.empty and 'intervencao_temp' in df_meta.columns:
-    df_meta['intervencao_temp'] = df_meta['intervencao_temp'].astype(str).str.replace('.0', '', regex=False)
+    df_meta['intervencao_temp'] = df_meta['intervencao_temp'].astype(str).str.removesuffix('.0')
 
 # Junta Meta (Planejado) com Executado
 df_painel_int = pd.merge(df_meta, total_int, on=['ano', 'uo_cod', 'acao_cod', 'intervencao_temp'], how='outer')
@@ -310,14 +363,16 @@ df_painel_int = pd.merge(df_meta, total_int, on=['ano', 'uo_cod', 'acao_cod', 'i
 cols_fill = ['valor_plano', 'liquidado_final']
 for c in cols_fill: 
     if c not in df_painel_int.columns: df_painel_int[c] = 0
-    df_painel_int[c] = df_painel_int[c].fillna(0)
+# Um único fillna para as duas colunas (dict coluna -> valor)
+df_painel_int.fillna({c: 0 for c in cols_fill}, inplace=True)
 
 df_painel_int['saldo_plano'] = df_painel_int['valor_plano'] - df_painel_int['liquidado_final']
 
 # Traz descrições de UO e Ação
 df_painel_int['uo_sigla'] = df_painel_int['uo_cod'].dropna().astype(str).map(mapa_siglas)
 if not df_acao.empty: 
-    df_painel_int['acao_desc'] = df_painel_int['acao_cod'].dropna().astype(str).map(df_acao.set_index('acao_cod')['acao_desc'].to_dict())
+    mapa_acoes = df_acao.drop_duplicates('acao_cod', keep='last').set_index('acao_cod')['acao_desc']
+    df_painel_int['acao_desc'] = df_painel_int['acao_cod'].dropna().astype(str).map(mapa_acoes)
 
 # Renomeia para nome final e salva
 df_painel_int.rename(columns={'intervencao_temp': 'cod_intervencao'}, inplace=True)
@@ -10,6 +10,7 @@ para garantir que as descrições (sigla, desc) sejam trazidas corretamente.
 """
 
 from __future__ import annotations
+import numpy as np
 import pandas as pd
 from functools import lru_cache
 
@@ -62,44 +63,101 @@ def _ensure_join_types(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
     return df
 
 
+# Tipos finais dos códigos, iguais em load_rp_view: fixos, não escolhidos
+# pelos valores de cada recorte. ano cabe em Int16; códigos em Int32, com folga
+CODE_DTYPES = {
+    "ano": "Int16",
+    "uo_cod": "Int32",
+    "acao_cod": "Int32",
+    "elemento_item_cod": "Int32",
+    "grupo_cod": "Int32",
+    "fonte_cod": "Int32",
+    "ipu_cod": "Int32",
+}
+
+
+# Colunas lidas da fato: as da view que vêm do arquivo (descrições chegam
+# pelos joins). Os filtros (fonte, ipu, uo) já estão entre elas.
+RAW_COLS = [c for c in EXEC_VIEW_COLS
+            if c not in ("uo_sigla", "acao_desc", "elemento_item_desc")]
+
+
 @lru_cache(maxsize=2)
 def _load_execucao_raw() -> pd.DataFrame:
-    """Lê a execução bruta."""
-    df = pd.read_csv(PATH_EXEC, compression="gzip", low_memory=False)
-    return df
+    """
+    Lê a execução, só com as colunas usadas (RAW_COLS) e o filtro global.
+    Leitor pyarrow (multithread); se faltar o pyarrow ou alguma coluna no
+    arquivo, cai no leitor padrão, que ignora as ausentes.
+    """
+    try:
+        df = pd.read_csv(PATH_EXEC, compression="gzip", engine="pyarrow",
+                         usecols=RAW_COLS)
+    except (ImportError, KeyError, ValueError):
+        df = pd.read_csv(PATH_EXEC, compression="gzip", low_memory=False,
+                         usecols=lambda c: c in RAW_COLS)
+    # Filtro global aplicado já na leitura: o cache guarda só o recorte do
+    # painel, e cada chamada da view (por UO) parte dele, não da base inteira
+    return _apply_global_filter(df)
 
 
 @lru_cache(maxsize=4)
-def _load_dim_uo() -> pd.DataFrame:
+def _load_dim_uo() -> pd.Series:
     """Lê dimensão UO e padroniza chaves."""
-    df = pd.read_csv(PATH_UO, low_memory=False)
-    # Seleciona colunas e remove duplicatas de chave
-    df = df[["ano", "uo_cod", "uo_sigla"]].drop_duplicates(subset=["ano", "uo_cod"])
+    df = pd.read_csv(
+        PATH_UO,
+        usecols=["ano", "uo_cod", "uo_sigla"],
+        dtype={"uo_sigla": str},
+    )
+    # Remove duplicatas de chave
+    df = df.drop_duplicates(subset=["ano", "uo_cod"])
     # Padroniza chaves
     df = _ensure_join_types(df, ["ano", "uo_cod"])
-    return df
+    # Já indexada pela chave: o lookup da view não refaz o set_index
+    return df.set_index(["ano", "uo_cod"])["uo_sigla"]
 
 
 @lru_cache(maxsize=4)
-def _load_dim_acao() -> pd.DataFrame:
+def _load_dim_acao() -> pd.Series:
     """Lê dimensão Ação e padroniza chaves."""
-    df = pd.read_csv(PATH_ACAO, low_memory=False)
-    df = df[["ano", "acao_cod", "acao_desc"]].drop_duplicates(subset=["ano", "acao_cod"])
+    df = pd.read_csv(
+        PATH_ACAO,
+        usecols=["ano", "acao_cod", "acao_desc"],
+        dtype={"acao_desc": str},
+    )
+    df = df.drop_duplicates(subset=["ano", "acao_cod"])
     df = _ensure_join_types(df, ["ano", "acao_cod"])
-    return df
+    # Já indexada pela chave: o lookup da view não refaz o set_index
+    return df.set_index(["ano", "acao_cod"])["acao_desc"]
 
 
 @lru_cache(maxsize=4)
-def _load_dim_elemento_item() -> pd.DataFrame:
+def _load_dim_elemento_item() -> pd.Series:
     """Lê dimensão Elemento Item e padroniza chaves."""
-    df = pd.read_csv(PATH_ELI, low_memory=False)
-    df = df[["ano", "elemento_item_cod", "elemento_item_desc"]].drop_duplicates(subset=["ano", "elemento_item_cod"])
+    df = pd.read_csv(
+        PATH_ELI,
+        usecols=["ano", "elemento_item_cod", "elemento_item_desc"],
+        dtype={"elemento_item_desc": str},
+    )
+    df = df.drop_duplicates(subset=["ano", "elemento_item_cod"])
     df = _ensure_join_types(df, ["ano", "elemento_item_cod"])
+    # Já indexada pela chave: o lookup da view não refaz o set_index
+    return df.set_index(["ano", "elemento_item_cod"])["elemento_item_desc"]
+
+
+def _lookup_dim(df: pd.DataFrame, dim: pd.Series) -> pd.DataFrame:
+    """
+    Left join de uma coluna de descrição: `dim` é a descrição indexada pela
+    chave única (ex.: ano + uo_cod), então basta um reindex pelo índice
+    composto da fato, sem montar o merge inteiro. Chaves nulas casam entre
+    si, como no merge (a dimensão elemento_item tem chave nula).
+    """
+    keys = list(dim.index.names)
+    df[dim.name] = dim.reindex(pd.MultiIndex.from_arrays([df[k] for k in keys])).to_numpy()
     return df
 
 
-def _apply_global_filter(df: pd.DataFrame) -> pd.DataFrame:
-    """(fonte_cod = 89 OR ipu_cod = 0) AND uo_cod != 1261"""
+def _apply_global_filter(df: pd.DataFrame, restrict_uo: int | None = None) -> pd.DataFrame:
+    """(fonte_cod = 89 OR ipu_cod = 0) AND uo_cod != 1261 [AND uo_cod = restrict_uo]"""
     # Garante numérico para filtrar
     for c in ["fonte_cod", "ipu_cod", "uo_cod"]:
         if c in df.columns:
@@ -109,45 +167,51 @@ def _apply_global_filter(df: pd.DataFrame) -> pd.DataFrame:
         ((df["fonte_cod"] == 89) | (df["ipu_cod"] == 0)) 
         & (df["uo_cod"] != 1261)
     )
-    return df.loc[mask].copy()
+    # RLS entra na mesma máscara: uma só materialização do recorte
+    if restrict_uo is not None:
+        mask &= df["uo_cod"] == int(restrict_uo)
+    # take: uma única cópia das linhas selecionadas, já desvinculada de `df`
+    # (loc[mask].copy() alocava o recorte duas vezes)
+    return df.take(np.flatnonzero(mask.to_numpy()))
 
 
 def load_execucao_view(restrict_uo: int | None = None) -> pd.DataFrame:
     """
     Gera a tabela completa (Fato + Dimensões) com joins seguros.
     """
-    # 1. Carrega Fato
+    # 1. Carrega Fato e aplica filtro global + restrição de segurança (RLS)
     df = _load_execucao_raw()
-    df = _apply_global_filter(df)
+    df = _apply_global_filter(df, restrict_uo)
 
     # 2. Padroniza chaves na Fato ANTES do join
     # Isso garante que 1021.0 vire 1021 (Int64)
     join_keys = ["ano", "uo_cod", "acao_cod", "elemento_item_cod"]
     df = _ensure_join_types(df, join_keys)
 
-    # 3. Restrição de segurança (RLS)
-    if restrict_uo is not None:
-        df = df.loc[df["uo_cod"] == int(restrict_uo)].copy()
-
-    # 4. Carrega Dimensões (já padronizadas dentro das funções _load)
+    # 3. Carrega Dimensões (já padronizadas dentro das funções _load)
     dim_uo = _load_dim_uo()
     dim_acao = _load_dim_acao()
     dim_eli = _load_dim_elemento_item()
 
-    # 5. Executa os Joins (Left Join)
+    # 4. Executa os Joins (Left Join)
     # Apenas registros que tem match de (ano + codigo) trarão a descrição
-    df = df.merge(dim_uo, on=["ano", "uo_cod"], how="left")
-    df = df.merge(dim_acao, on=["ano", "acao_cod"], how="left")
-    df = df.merge(dim_eli, on=["ano", "elemento_item_cod"], how="left")
+    # Índice 0..n-1, como o merge devolvia
+    df.index = pd.RangeIndex(len(df))
+    df = _lookup_dim(df, dim_uo)
+    df = _lookup_dim(df, dim_acao)
+    df = _lookup_dim(df, dim_eli)
 
-    # 6. Preenchimento de Falhas (Opcional mas recomendado)
+    # 5. Preenchimento de Falhas (Opcional mas recomendado)
     # Se não achar a descrição, preenche para não ficar vazio na tabela
-    if "uo_sigla" in df.columns:
-        df["uo_sigla"] = df["uo_sigla"].fillna("UO-" + df["uo_cod"].astype(str))
-    if "acao_desc" in df.columns:
-        df["acao_desc"] = df["acao_desc"].fillna("Ação " + df["acao_cod"].astype(str))
+    # Texto de fallback montado só nas linhas sem descrição
+    for col, key, prefixo in (("uo_sigla", "uo_cod", "UO-"),
+                              ("acao_desc", "acao_cod", "Ação ")):
+        if col in df.columns:
+            falta = df[col].isna().to_numpy()
+            if falta.any():
+                df.loc[falta, col] = prefixo + df.loc[falta, key].astype(str)
 
-    # 7. Tratamento Final de Tipos
+    # 6. Tratamento Final de Tipos
     
     # Métricas -> Float
     metric_cols = ["vlr_empenhado", "vlr_liquidado", "vlr_pago_orcamentario"]
@@ -162,15 +226,29 @@ def load_execucao_view(restrict_uo: int | None = None) -> pd.DataFrame:
         "cnpj_cpf_formatado", "num_contrato_saida", "num_obra", "num_empenho", 
         "uo_sigla", "acao_desc", "elemento_item_desc"
     ]
-    for col in text_dims:
-        if col in df.columns:
-            df[col] = df[col].astype(str).replace("nan", "").replace("<NA>", "")
+    # Em bloco: um só astype(str) e um só replace (lista) para todas
+    text_dims = [c for c in text_dims if c in df.columns]
+    df[text_dims] = df[text_dims].astype(str).replace(["nan", "<NA>"], "")
 
     # Outros Códigos -> Int64
     other_ints = ["grupo_cod", "fonte_cod", "ipu_cod"]
     df = _ensure_join_types(df, other_ints)
 
+    # 7. Redução de memória
+    # Códigos -> tipos fixos de CODE_DTYPES (o schema não muda com o recorte).
+    # Métricas ficam em float64: float32 perde os centavos acima de ~R$ 160 mil.
+    for col, dtype in CODE_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    # Descrições e identificadores repetidos -> category (groupby no app usa
+    # observed=True). num_empenho fica texto: é quase único por linha.
+    for col in ["uo_sigla", "acao_desc", "elemento_item_desc",
+                "cnpj_cpf_formatado", "num_contrato_saida", "num_obra"]:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
     # Seleção Final
     final_cols = [c for c in EXEC_VIEW_COLS if c in df.columns]
     
-    return df[final_cols].copy()
\ No newline at end of file
+    # reindex: uma única cópia (df[cols].copy() copiava duas vezes)
+    return df.reindex(columns=final_cols)
\ No newline at end of file
@@ -18,26 +18,66 @@ import os
 import pandas as pd
 
 
+# "R$", pontos de milhar e vírgula decimal tratados numa única passada
+_BRL_TRANS = str.maketrans({"R": None, "$": None, ".": None, ",": "."})
+
+
 def _to_float_br(series: pd.Series) -> pd.Series:
     """Converte textos no formato 'R$ 1.234,56' para float com ponto decimal."""
-    s = series.astype(str)
-    s = s.str.replace("R$", "", regex=False)
-    s = s.str.replace(".", "", regex=False)
-    s = s.str.replace(",", ".", regex=False)
+    s = series.astype(str).str.translate(_BRL_TRANS)
     return pd.to_numeric(s, errors="coerce").fillna(0.0)
 
 
+# Bases lidas por load_metrics: limites, execução e restos a pagar
+METRICS_PATHS = (
+    "data-raw/propag_investimentos_limite_2026.csv",
+    "datapackages/siafi-2026/data/execucao.csv.gz",
+    "datapackages/siafi-2026/data/restos_pagar.csv.gz",
+)
+
+# Colunas do filtro global; cada base soma mais uma coluna de valor
+FILTER_COLS = ["ano", "uo_cod", "fonte_cod", "ipu_cod"]
+
+
+def _read_fact(path: str, value_col: str) -> pd.DataFrame:
+    """
+    Lê de uma base .csv.gz só as colunas do filtro e a de valor.
+    Leitor pyarrow (multithread); sem pyarrow ou com coluna ausente no
+    arquivo, cai no leitor padrão, que ignora as ausentes.
+    """
+    cols = FILTER_COLS + [value_col]
+    try:
+        return pd.read_csv(path, compression="gzip", engine="pyarrow",
+                           usecols=cols)
+    except (ImportError, KeyError, ValueError):
+        return pd.read_csv(path, compression="gzip", low_memory=False,
+                           usecols=lambda c: c in cols)
+
+
+def metrics_fingerprint() -> tuple:
+    """
+    (caminho, mtime_ns, tamanho) de cada base de METRICS_PATHS; muda quando
+    algum arquivo é regravado. Arquivo ausente entra como (caminho, 0, 0).
+    """
+    fp = []
+    for arq in METRICS_PATHS:
+        try:
+            fstat = os.stat(arq)
+            fp.append((arq, fstat.st_mtime_ns, fstat.st_size))
+        except FileNotFoundError:
+            fp.append((arq, 0, 0))
+    return tuple(fp)
+
+
 def load_metrics() -> tuple[float, float, float]:
     """
     Retorna (valor_total_plano, valor_total_liquidado, saldo_a_liquidar)
     alinhado ao filtro global do painel.
     """
-    path_limites = "data-raw/propag_investimentos_limite_2026.csv"
-    path_execucao = "datapackages/siafi-2026/data/execucao.csv.gz"
-    path_rp = "datapackages/siafi-2026/data/restos_pagar.csv.gz"
+    path_limites, path_execucao, path_rp = METRICS_PATHS
 
     # Se faltar qualquer arquivo, retorna zero para não quebrar o app.
-    for arq in (path_limites, path_execucao, path_rp):
+    for arq in METRICS_PATHS:
         if not os.path.exists(arq):
             return 0.0, 0.0, 0.0
 
@@ -50,7 +90,7 @@ def load_metrics() -> tuple[float, float, float]:
 
     # --- Valor Total Liquidado (execução + RP liquidado) ---
     # Execução no exercício (2026)
-    df_exec = pd.read_csv(path_execucao, compression="gzip", low_memory=False)
+    df_exec = _read_fact(path_execucao, "vlr_liquidado")
     # Garante tipos numéricos
     for c in ("ano", "uo_cod", "fonte_cod", "ipu_cod"):
         if c in df_exec.columns:
@@ -66,7 +106,7 @@ def load_metrics() -> tuple[float, float, float]:
     total_execucao = float(df_exec.loc[filtro_exec, "vlr_liquidado"].sum())
 
     # Restos a pagar liquidados em 2026
-    df_rp = pd.read_csv(path_rp, compression="gzip", low_memory=False)
+    df_rp = _read_fact(path_rp, "vlr_despesa_liquidada_rpnp")
     for c in ("ano", "uo_cod", "fonte_cod", "ipu_cod"):
         if c in df_rp.columns:
             df_rp[c] = pd.to_numeric(df_rp[c], errors="coerce")
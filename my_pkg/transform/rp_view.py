@@ -9,6 +9,7 @@ Aplica o filtro global do painel:
 """
 
 from __future__ import annotations
+import numpy as np
 import pandas as pd
 from functools import lru_cache
 
@@ -67,42 +68,110 @@ def _ensure_join_types(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
     return df
 
 
+# Tipos finais dos códigos, iguais em load_execucao_view: fixos, não
+# escolhidos pelos valores de cada recorte. Anos em Int16; códigos em Int32
+CODE_DTYPES = {
+    "ano": "Int16",
+    "ano_rp": "Int16",
+    "uo_cod": "Int32",
+    "acao_cod": "Int32",
+    "elemento_item_cod": "Int32",
+    "grupo_cod": "Int32",
+    "fonte_cod": "Int32",
+    "ipu_cod": "Int32",
+}
+
+
+# Colunas base necessárias para os cálculos das métricas
+METRIC_BASE_COLS = [
+    "vlr_inscrito_rpp", "vlr_cancelado_rpp", "vlr_desconto_rpp", "vlr_restabelecido_rpp",
+    "vlr_pago_rpp", "vlr_anulacao_pagamento_rpp", "vlr_retencao_rpp", "vlr_anulacao_retencao_rpp",
+    "vlr_saldo_rpp", 
+    "vlr_inscrito_rpnp", "vlr_cancelado_rpnp", "vlr_restabelecido_rpnp",
+    "vlr_despesa_liquidada_rpnp", "vlr_saldo_rpnp", "vlr_despesa_liquidada_pagar"
+]
+
+# Colunas lidas da fato: as da view que vêm do arquivo (descrições chegam
+# pelos joins e as calc_* são calculadas) mais as bases das métricas
+RAW_COLS = [c for c in RP_VIEW_COLS
+            if c not in ("uo_sigla", "acao_desc", "elemento_item_desc")
+            and not c.startswith("calc_")] + METRIC_BASE_COLS
+
+
 @lru_cache(maxsize=2)
 def _load_rp_raw() -> pd.DataFrame:
-    """Lê a base bruta de Restos a Pagar."""
-    df = pd.read_csv(PATH_RP, compression="gzip", low_memory=False)
-    return df
+    """
+    Lê Restos a Pagar, só com as colunas usadas (RAW_COLS) e o filtro global.
+    Leitor pyarrow (multithread); se faltar o pyarrow ou alguma coluna no
+    arquivo, cai no leitor padrão, que ignora as ausentes.
+    """
+    try:
+        df = pd.read_csv(PATH_RP, compression="gzip", engine="pyarrow",
+                         usecols=RAW_COLS)
+    except (ImportError, KeyError, ValueError):
+        df = pd.read_csv(PATH_RP, compression="gzip", low_memory=False,
+                         usecols=lambda c: c in RAW_COLS)
+    # Filtro global aplicado já na leitura: o cache guarda só o recorte do
+    # painel, e cada chamada da view (por UO) parte dele, não da base inteira
+    return _apply_global_filter(df)
 
 
 @lru_cache(maxsize=4)
-def _load_dim_uo() -> pd.DataFrame:
+def _load_dim_uo() -> pd.Series:
     """Dimensão UO."""
-    df = pd.read_csv(PATH_UO, low_memory=False)
-    df = df[["ano", "uo_cod", "uo_sigla"]].drop_duplicates(subset=["ano", "uo_cod"])
+    df = pd.read_csv(
+        PATH_UO,
+        usecols=["ano", "uo_cod", "uo_sigla"],
+        dtype={"uo_sigla": str},
+    )
+    df = df.drop_duplicates(subset=["ano", "uo_cod"])
     df = _ensure_join_types(df, ["ano", "uo_cod"])
-    return df
+    # Já indexada pela chave: o lookup da view não refaz o set_index
+    return df.set_index(["ano", "uo_cod"])["uo_sigla"]
 
 
 @lru_cache(maxsize=4)
-def _load_dim_acao() -> pd.DataFrame:
+def _load_dim_acao() -> pd.Series:
     """Dimensão Ação."""
-    df = pd.read_csv(PATH_ACAO, low_memory=False)
-    df = df[["ano", "acao_cod", "acao_desc"]].drop_duplicates(subset=["ano", "acao_cod"])
+    df = pd.read_csv(
+        PATH_ACAO,
+        usecols=["ano", "acao_cod", "acao_desc"],
+        dtype={"acao_desc": str},
+    )
+    df = df.drop_duplicates(subset=["ano", "acao_cod"])
     df = _ensure_join_types(df, ["ano", "acao_cod"])
-    return df
+    # Já indexada pela chave: o lookup da view não refaz o set_index
+    return df.set_index(["ano", "acao_cod"])["acao_desc"]
 
 
 @lru_cache(maxsize=4)
-def _load_dim_elemento_item() -> pd.DataFrame:
+def _load_dim_elemento_item() -> pd.Series:
     """Dimensão Elemento Item."""
-    df = pd.read_csv(PATH_ELI, low_memory=False)
-    df = df[["ano", "elemento_item_cod", "elemento_item_desc"]].drop_duplicates(subset=["ano", "elemento_item_cod"])
+    df = pd.read_csv(
+        PATH_ELI,
+        usecols=["ano", "elemento_item_cod", "elemento_item_desc"],
+        dtype={"elemento_item_desc": str},
+    )
+    df = df.drop_duplicates(subset=["ano", "elemento_item_cod"])
     df = _ensure_join_types(df, ["ano", "elemento_item_cod"])
+    # Já indexada pela chave: o lookup da view não refaz o set_index
+    return df.set_index(["ano", "elemento_item_cod"])["elemento_item_desc"]
+
+
+def _lookup_dim(df: pd.DataFrame, dim: pd.Series) -> pd.DataFrame:
+    """
+    Left join de uma coluna de descrição: `dim` é a descrição indexada pela
+    chave única (ex.: ano + uo_cod), então basta um reindex pelo índice
+    composto da fato, sem montar o merge inteiro. Chaves nulas casam entre
+    si, como no merge (a dimensão elemento_item tem chave nula).
+    """
+    keys = list(dim.index.names)
+    df[dim.name] = dim.reindex(pd.MultiIndex.from_arrays([df[k] for k in keys])).to_numpy()
     return df
 
 
-def _apply_global_filter(df: pd.DataFrame) -> pd.DataFrame:
-    """Filtro: (fonte=89 OR ipu=0) AND uo!=1261"""
+def _apply_global_filter(df: pd.DataFrame, restrict_uo: int | None = None) -> pd.DataFrame:
+    """Filtro: (fonte=89 OR ipu=0) AND uo!=1261 [AND uo_cod = restrict_uo]"""
     for c in ["fonte_cod", "ipu_cod", "uo_cod"]:
         if c in df.columns:
             df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
@@ -111,7 +180,12 @@ def _apply_global_filter(df: pd.DataFrame) -> pd.DataFrame:
         ((df["fonte_cod"] == 89) | (df["ipu_cod"] == 0)) 
         & (df["uo_cod"] != 1261)
     )
-    return df.loc[mask].copy()
+    # RLS entra na mesma máscara: uma só materialização do recorte
+    if restrict_uo is not None:
+        mask &= df["uo_cod"] == int(restrict_uo)
+    # take: uma única cópia das linhas selecionadas, já desvinculada de `df`
+    # (loc[mask].copy() alocava o recorte duas vezes)
+    return df.take(np.flatnonzero(mask.to_numpy()))
 
 
 def _calculate_metrics(df: pd.DataFrame) -> pd.DataFrame:
@@ -119,68 +193,58 @@ def _calculate_metrics(df: pd.DataFrame) -> pd.DataFrame:
     Realiza o cálculo das colunas de métricas solicitadas.
     Preenche NaN com 0.0 antes de calcular para evitar propagação de nulos.
     """
-    # Lista de colunas base necessárias para os cálculos
-    cols_base = [
-        "vlr_inscrito_rpp", "vlr_cancelado_rpp", "vlr_desconto_rpp", "vlr_restabelecido_rpp",
-        "vlr_pago_rpp", "vlr_anulacao_pagamento_rpp", "vlr_retencao_rpp", "vlr_anulacao_retencao_rpp",
-        "vlr_saldo_rpp", 
-        "vlr_inscrito_rpnp", "vlr_cancelado_rpnp", "vlr_restabelecido_rpnp",
-        "vlr_despesa_liquidada_rpnp", "vlr_saldo_rpnp", "vlr_despesa_liquidada_pagar"
-    ]
-    
-    # Garante que todas existam e sejam float
-    for c in cols_base:
-        if c not in df.columns:
-            df[c] = 0.0
-        else:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
-
-    # --- PROCESSADOS (RPP) ---
-    # Inscrito Processado
-    df["calc_inscrito_rpp"] = df["vlr_inscrito_rpp"]
-    
-    # Cancelado Processado
-    df["calc_cancelado_rpp"] = (
-        df["vlr_cancelado_rpp"] + df["vlr_desconto_rpp"] - df["vlr_restabelecido_rpp"]
-    )
-    
-    # Pago Processado
-    df["calc_pago_rpp"] = (
-        df["vlr_pago_rpp"] - df["vlr_anulacao_pagamento_rpp"] 
-        + df["vlr_retencao_rpp"] - df["vlr_anulacao_retencao_rpp"]
-    )
-    
-    # Saldo Processado
-    df["calc_saldo_rpp"] = df["vlr_saldo_rpp"]
+    # Bloco float64 único com as colunas base (METRIC_BASE_COLS); ausentes = 0.0
+    bloco = np.column_stack([
+        pd.to_numeric(df[c], errors="coerce").to_numpy(dtype="float64")
+        if c in df.columns else np.zeros(len(df))
+        for c in METRIC_BASE_COLS
+    ]) if len(df) else np.zeros((0, len(METRIC_BASE_COLS)))
+    bloco[np.isnan(bloco)] = 0.0
+    v = dict(zip(METRIC_BASE_COLS, bloco.T))
 
-    # --- NÃO PROCESSADOS (RPNP) ---
-    # Inscrito Não Processado
-    df["calc_inscrito_rpnp"] = df["vlr_inscrito_rpnp"]
-    
-    # Cancelado Não Processado
-    df["calc_cancelado_rpnp"] = (
-        df["vlr_cancelado_rpnp"] - df["vlr_restabelecido_rpnp"]
-    )
-    
-    # Liquidado Não Processado
-    df["calc_liquidado_rpnp"] = df["vlr_despesa_liquidada_rpnp"]
-    
-    # Saldo Não Processado
-    df["calc_saldo_rpnp"] = df["vlr_saldo_rpnp"]
-    
-    # Pago Não Processado (Fórmula solicitada)
-    df["calc_pago_rpnp"] = (
-        df["vlr_saldo_rpp"] + df["vlr_despesa_liquidada_rpnp"] - df["vlr_despesa_liquidada_pagar"]
-    )
+    # Contas direto nos arrays: sem Series intermediárias nem alinhamento
+    # de índice a cada operação
+    calc = {
+        # --- PROCESSADOS (RPP) ---
+        # Inscrito Processado
+        "calc_inscrito_rpp": v["vlr_inscrito_rpp"],
+        # Cancelado Processado
+        "calc_cancelado_rpp": (
+            v["vlr_cancelado_rpp"] + v["vlr_desconto_rpp"] - v["vlr_restabelecido_rpp"]
+        ),
+        # Pago Processado
+        "calc_pago_rpp": (
+            v["vlr_pago_rpp"] - v["vlr_anulacao_pagamento_rpp"]
+            + v["vlr_retencao_rpp"] - v["vlr_anulacao_retencao_rpp"]
+        ),
+        # Saldo Processado
+        "calc_saldo_rpp": v["vlr_saldo_rpp"],
+
+        # --- NÃO PROCESSADOS (RPNP) ---
+        # Inscrito Não Processado
+        "calc_inscrito_rpnp": v["vlr_inscrito_rpnp"],
+        # Cancelado Não Processado
+        "calc_cancelado_rpnp": v["vlr_cancelado_rpnp"] - v["vlr_restabelecido_rpnp"],
+        # Liquidado Não Processado
+        "calc_liquidado_rpnp": v["vlr_despesa_liquidada_rpnp"],
+        # Saldo Não Processado
+        "calc_saldo_rpnp": v["vlr_saldo_rpnp"],
+        # Pago Não Processado (Fórmula solicitada)
+        "calc_pago_rpnp": (
+            v["vlr_saldo_rpp"] + v["vlr_despesa_liquidada_rpnp"] - v["vlr_despesa_liquidada_pagar"]
+        ),
+    }
+    for col, arr in calc.items():
+        df[col] = arr
 
     return df
 
 
 def load_rp_view(restrict_uo: int | None = None) -> pd.DataFrame:
     """Gera a tabela completa de RP com métricas calculadas e joins."""
-    # 1. Carrega e Filtra
+    # 1. Carrega e Filtra (filtro global + RLS)
     df = _load_rp_raw()
-    df = _apply_global_filter(df)
+    df = _apply_global_filter(df, restrict_uo)
     
     # 2. Calcula Métricas
     df = _calculate_metrics(df)
@@ -189,40 +253,53 @@ def load_rp_view(restrict_uo: int | None = None) -> pd.DataFrame:
     join_keys = ["ano", "uo_cod", "acao_cod", "elemento_item_cod"]
     df = _ensure_join_types(df, join_keys)
 
-    # 4. RLS (Segurança)
-    if restrict_uo is not None:
-        df = df.loc[df["uo_cod"] == int(restrict_uo)].copy()
-
-    # 5. Joins com Dimensões
+    # 4. Joins com Dimensões
     dim_uo = _load_dim_uo()
     dim_acao = _load_dim_acao()
     dim_eli = _load_dim_elemento_item()
 
-    df = df.merge(dim_uo, on=["ano", "uo_cod"], how="left")
-    df = df.merge(dim_acao, on=["ano", "acao_cod"], how="left")
-    df = df.merge(dim_eli, on=["ano", "elemento_item_cod"], how="left")
+    # Índice 0..n-1, como o merge devolvia
+    df.index = pd.RangeIndex(len(df))
+    df = _lookup_dim(df, dim_uo)
+    df = _lookup_dim(df, dim_acao)
+    df = _lookup_dim(df, dim_eli)
 
-    # 6. Preenchimento visual
-    if "uo_sigla" in df.columns:
-        df["uo_sigla"] = df["uo_sigla"].fillna("UO-" + df["uo_cod"].astype(str))
-    if "acao_desc" in df.columns:
-        df["acao_desc"] = df["acao_desc"].fillna("Ação " + df["acao_cod"].astype(str))
+    # 5. Preenchimento visual
+    # Texto de fallback montado só nas linhas sem descrição
+    for col, key, prefixo in (("uo_sigla", "uo_cod", "UO-"),
+                              ("acao_desc", "acao_cod", "Ação ")):
+        if col in df.columns:
+            falta = df[col].isna().to_numpy()
+            if falta.any():
+                df.loc[falta, col] = prefixo + df.loc[falta, key].astype(str)
 
-    # 7. Tipagem Final
+    # 6. Tipagem Final
     # Strings
     text_dims = [
         "cnpj_cpf_formatado", "num_contrato_saida", "num_obra", "num_empenho", 
         "razao_social_credor", "uo_sigla", "acao_desc", "elemento_item_desc"
     ]
-    for col in text_dims:
-        if col in df.columns:
-            df[col] = df[col].astype(str).replace("nan", "").replace("<NA>", "")
+    # Em bloco: um só astype(str) e um só replace (lista) para todas
+    text_dims = [c for c in text_dims if c in df.columns]
+    df[text_dims] = df[text_dims].astype(str).replace(["nan", "<NA>"], "")
             
-    # Ints
+    # Ints: tipos fixos de CODE_DTYPES (o schema não muda com o recorte)
     int_cols = ["ano", "ano_rp", "grupo_cod", "fonte_cod", "ipu_cod"]
     df = _ensure_join_types(df, int_cols)
+    for col, dtype in CODE_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+
+    # 7. Descrições e identificadores repetidos -> category (groupby no app
+    # usa observed=True). num_empenho fica texto: é quase único por linha.
+    for col in ["uo_sigla", "acao_desc", "elemento_item_desc",
+                "cnpj_cpf_formatado", "razao_social_credor",
+                "num_contrato_saida", "num_obra"]:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
 
     # 8. Seleção
     final_cols = [c for c in RP_VIEW_COLS if c in df.columns]
     
-    return df[final_cols].copy()
\ No newline at end of file
+    # reindex: uma única cópia (df[cols].copy() copiava duas vezes)
+    return df.reindex(columns=final_cols)
\ No newline at end of file
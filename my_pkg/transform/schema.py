@@ -27,9 +27,20 @@ BOOL_COLS: List[str] = [
     "4_bimestre_planejado","5_bimestre_planejado","6_bimestre_planejado",
 ]
 
+# Descrições de baixa cardinalidade, guardadas como category no app
+# (precisam ficar fora de EDITABLE_COLS):
+CATEGORY_COLS: List[str] = ["uo_sigla", "acao_desc", "intervencao_desc"]
+
 # Editáveis pelo usuário no app:
 EDITABLE_COLS: List[str] = list(NUMERIC_COLS)
 
+# Bloqueadas no editor (derivadas uma vez, no import):
+READONLY_COLS: List[str] = [c for c in ALL_COLS if c not in EDITABLE_COLS]
+# Editor com inclusão de linhas: "novo_marco" fica marcável
+READONLY_COLS_DYNAMIC: List[str] = [
+    c for c in READONLY_COLS if c != "novo_marco"
+]
+
 # Campos obrigatórios quando inserir uma linha nova:
 REQUIRED_ON_NEW: List[str] = [
     "uo_cod","uo_sigla","acao_cod","acao_desc","intervencao_cod",
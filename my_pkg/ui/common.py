@@ -0,0 +1,697 @@
+# my_pkg/ui/common.py
+# -*- coding: utf-8 -*-
+"""
+Funções compartilhadas pelos painéis Streamlit (app.py e applayout.py):
+formatação BRL, autenticação/RBAC, leitura normalizada da planilha do
+Cronograma (em cache), validação das edições e gravação no Google Sheets.
+
+Os decoradores de cache ficam aqui, na única implementação: o cache vale
+para qualquer um dos dois pontos de entrada.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import re
+import time
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit_authenticator as stauth
+import yaml
+from gspread.utils import rowcol_to_a1
+
+# Loader em C (libyaml) quando disponível; senão o SafeLoader puro Python
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+from my_pkg.transform.execucao_view import load_execucao_view
+from my_pkg.transform.metrics import load_metrics, metrics_fingerprint
+from my_pkg.transform.rp_view import load_rp_view
+from my_pkg.transform.schema import (
+    ALL_COLS,
+    BOOL_COLS,
+    CATEGORY_COLS,
+    NUMERIC_COLS,
+    REQUIRED_ON_NEW,
+)
+
+_log = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Formatação
+# =============================================================================
+
+
+# Troca de separadores "1,234.56" -> "1.234,56" numa única passada
+_BRL_TRANS = str.maketrans(',.', '.,')
+# "R$", espaços e pontos de milhar, removidos de uma vez na leitura
+_BRL_STRIP = re.compile(r'[R$\s.]')
+# Vírgula decimal -> ponto, por tabela de tradução (sem regex)
+_DECIMAL_TRANS = str.maketrans(',', '.')
+
+
+def brl(value: float) -> str:
+    """Formata float para string de moeda BRL."""
+    if pd.isna(value):
+        return 'R$ 0,00'
+    try:
+        return 'R$ ' + f'{float(value):,.2f}'.translate(_BRL_TRANS)
+    except (TypeError, ValueError):
+        return 'R$ 0,00'
+
+
+def format_brl_edit(value) -> str:
+    """
+    Converte valor numérico para texto formato BR (R$ 1.000,00) para o
+    Editor.
+    """
+    if pd.isna(value) or (isinstance(value, str) and not value):
+        return ''
+    try:
+        val = float(value)
+        if val == 0:
+            return 'R$ 0,00'
+        return 'R$ ' + f'{val:,.2f}'.translate(_BRL_TRANS)
+    except (ValueError, TypeError):
+        return str(value)
+
+
+def format_brl_series(s: pd.Series) -> pd.Series:
+    """
+    Versão em coluna de `format_brl_edit`: a conversão numérica é feita de
+    uma vez e só a formatação passa por um laço simples (sem .apply).
+    """
+    num = pd.to_numeric(s, errors='coerce').to_numpy(
+        dtype='float64', na_value=np.nan
+    )
+    ok = ~np.isnan(num)
+    # Vazio/nulo -> ""; texto não numérico fica como está
+    if pd.api.types.is_numeric_dtype(s):
+        out = np.full(len(s), '', dtype=object)
+    else:
+        out = np.where(
+            (s.isna() | s.eq('')).to_numpy(), '', s.astype(str).to_numpy()
+        ).astype(object)
+    # Formata cada valor distinto uma só vez (as colunas bimestrais são quase
+    # todas zero) e espalha pelo inverso; + 0.0 normaliza -0.0 para "R$ 0,00"
+    uniq, inv = np.unique(num[ok] + 0.0, return_inverse=True)
+    fmt = np.array(
+        ['R$ ' + f'{v:,.2f}'.translate(_BRL_TRANS) for v in uniq], dtype=object
+    )
+    out[ok] = fmt[inv]
+    return pd.Series(out, index=s.index, name=s.name)
+
+
+def parse_brl_edit(value_str) -> float:
+    """Converte string formato BR (R$ 1.000,00) de volta para float."""
+    if isinstance(value_str, (int, float)):
+        return float(value_str)
+    if pd.isna(value_str) or not str(value_str).strip():
+        return 0.0
+
+    clean_str = (
+        str(value_str)
+        .replace('R$', '')
+        .replace(' ', '')
+        .replace('.', '')
+        .replace(',', '.')
+    )
+    try:
+        return float(clean_str)
+    except ValueError:
+        return 0.0
+
+
+def parse_brl_series(s: pd.Series) -> pd.Series:
+    """
+    Versão em coluna de `parse_brl_edit`: os textos são limpos e convertidos
+    numa única passada de `.str`; células já numéricas são mantidas.
+    """
+    vals = s.to_numpy(dtype=object)
+    is_num = np.fromiter(
+        (isinstance(v, (int, float)) for v in vals),
+        dtype=bool,
+        count=len(vals),
+    )
+    txt = (
+        s
+        .astype(str)
+        .str.replace(_BRL_STRIP, '', regex=True)
+        .str.translate(_DECIMAL_TRANS)
+    )
+    out = pd.to_numeric(txt, errors='coerce').fillna(0.0)
+    out[is_num] = vals[is_num].astype('float64')
+    return out
+
+
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Serializa o DataFrame em CSV (padrão BR) direto para bytes, sem cópia
+    em str.
+    """
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, sep=';', decimal=',', encoding='utf-8-sig')
+    return buf.getvalue()
+
+
+# =============================================================================
+# Autenticação e RBAC
+# =============================================================================
+
+
+def _empty_like(obj):
+    """
+    Contêiner puro vazio correspondente (dict/list), ou None para
+    escalares.
+    """
+    if isinstance(obj, Mapping):
+        return {}
+    if isinstance(obj, list):
+        return []
+    return None
+
+
+def to_plain_dict(obj):
+    """
+    Cópia de `obj` (ex.: st.secrets) só com dict/list puros. Percorre a árvore
+    com uma pilha explícita: sem recursão nem limite de profundidade.
+    """
+    root = _empty_like(obj)
+    if root is None:
+        return obj
+    stack = [(obj, root)]
+    while stack:
+        src, dst = stack.pop()
+        items = src.items() if isinstance(src, Mapping) else enumerate(src)
+        for k, v in items:
+            child = _empty_like(v)
+            node = v
+            if child is not None:
+                # Preenchido depois; o contêiner já ocupa sua posição
+                stack.append((v, child))
+                node = child
+            if isinstance(dst, dict):
+                dst[k] = node
+            else:
+                dst.append(node)
+    return root
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_auth_from_secrets() -> dict:
+    """Bloco [auth] do secrets.toml como dict puro; relido a cada 5 min."""
+    return to_plain_dict(st.secrets.get('auth', {}))
+
+
+@st.cache_data(show_spinner=False)
+def hashed_credentials(credentials: dict) -> dict:
+    """
+    Credenciais com todas as senhas já em bcrypt. O hash é lento de propósito:
+    calculado uma vez por processo, e não a cada nova sessão de login.
+    """
+    return stauth.Hasher.hash_passwords(credentials)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_rbac_from_secrets() -> dict[str, list]:
+    """
+    RBAC do secrets.toml; a cada 5 min relê (edições nos secrets valem sem
+    restart).
+    """
+    raw = st.secrets.get('rbac', {})
+    out: dict[str, list] = {}
+    for user, lst in raw.items():
+        if isinstance(lst, list) and len(lst) == 1 and lst[0] == '*':
+            out[user] = ['*']
+        else:
+            out[user] = list(map(int, lst))
+    return out
+
+
+@st.cache_data(show_spinner=False, max_entries=100)
+def _load_yaml_cached(path: str, mtime_ns: int, size: int) -> dict:
+    """
+    YAML já parseado; `mtime_ns` + `size` na chave refazem a leitura quando
+    o arquivo muda (o tamanho pega regravações dentro da resolução do mtime).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=_YamlLoader) or {}
+
+
+def load_access_yaml(
+    path: str = 'security/access_control.yaml',
+) -> dict[str, list]:
+    try:
+        fstat = os.stat(path)
+        data = _load_yaml_cached(path, fstat.st_mtime_ns, fstat.st_size)
+    except FileNotFoundError:
+        return {}
+    users = data.get('users', {})
+    return {u: v.get('allowed_uos', []) for u, v in users.items()}
+
+
+def resolve_allowed_uos(username: str) -> tuple[bool, frozenset[int] | None]:
+    """
+    (is_admin, UOs permitidas) do usuário: secrets primeiro, YAML como
+    fallback. Admin ("*") -> None. frozenset: imutável e hasheável, pode ir
+    direto como argumento de funções em cache. As duas fontes já vêm de cache
+    (o YAML pelo mtime), então aqui não há um cache próprio que as mascare.
+    """
+    allowed_uos_list = load_rbac_from_secrets().get(
+        username, []
+    ) or load_access_yaml().get(username, [])
+    if '*' in allowed_uos_list:
+        return True, None
+    return False, frozenset(map(int, allowed_uos_list))
+
+
+# =============================================================================
+# Normalização e validação
+# =============================================================================
+
+
+# Valores que viram TRUE nos checkboxes (comparados já em maiúsculas).
+# Array (e não set): np.isin trataria um set como um único objeto
+_TRUE_VALUES = np.array([
+    'TRUE',
+    'TRUE()',
+    '1',
+    'SIM',
+    'S',
+    'YES',
+    'VERDADEIRO',
+    'X',
+    'OK',
+    'V',
+])
+
+
+def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza dados brutos.
+    AGRESSIVIDADE NOS BOOLEANOS: Garante que colunas de Checkbox sejam bool
+    puro.
+    """
+    # 1. Garante todas as colunas: projeta em ALL_COLS (já na ordem final)
+    # numa única cópia; as ausentes entram vazias (None)
+    data = df.reindex(columns=ALL_COLS)
+    for c in data.columns.difference(df.columns):
+        data[c] = None
+
+    # 2. Tratamento Numérico, em bloco: as colunas de texto são limpas e
+    # convertidas numa só passada (achatadas) e todas as numéricas voltam
+    # ao frame como um único bloco float64
+    txt_cols = [c for c in NUMERIC_COLS if data[c].dtype == object]
+    if txt_cols:
+        flat = pd.Series(data[txt_cols].to_numpy(dtype=str).ravel())
+        flat = flat.str.replace(_BRL_STRIP, '', regex=True).str.translate(
+            _DECIMAL_TRANS
+        )
+        data[txt_cols] = (
+            pd
+            .to_numeric(flat, errors='coerce')
+            .to_numpy(dtype='float64')
+            .reshape(len(data), len(txt_cols))
+        )
+    data[NUMERIC_COLS] = data[NUMERIC_COLS].astype('float64').fillna(0.0)
+
+    # 3. Códigos como inteiros, convertidos uma única vez (uo_cod é o RLS).
+    # Int64 fixo: o tipo não depende dos valores da planilha, e um código
+    # maior numa linha nova não estoura a coluna
+    for c in ['uo_cod', 'acao_cod', 'intervencao_cod']:
+        data[c] = (
+            pd.to_numeric(data[c], errors='coerce').round(0).astype('Int64')
+        )
+
+    # 4. Tratamento Booleano (CRÍTICO PARA O CHECKBOX FUNCIONAR)
+    # Converte o bloco inteiro de uma vez: string, sem espaços, maiúsculo,
+    # e verifica se está na lista de 'Verdadeiros' (resultado já é bool).
+    # Colunas que já chegam como bool ficam fora do bloco.
+    bool_cols = [c for c in BOOL_COLS if data[c].dtype != bool]
+    if bool_cols:
+        block = data[bool_cols].astype(str).to_numpy(dtype=str)
+        data[bool_cols] = np.isin(
+            np.char.upper(np.char.strip(block)), _TRUE_VALUES
+        )
+
+    # 5. Descrições repetidas -> category: filtros e unique() operam sobre
+    # códigos inteiros (são colunas somente-leitura no editor)
+    for c in CATEGORY_COLS:
+        data[c] = data[c].astype('category')
+
+    return data
+
+
+# Chave de linha do Cronograma (identifica o marco na planilha)
+_ROW_KEY = ['uo_cod', 'acao_cod', 'intervencao_cod', 'marcos_principais']
+
+
+def _row_key_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hash uint64 da chave de cada linha (em C; colisão ~2^-64 é aceitável).
+    """
+    return pd.util.hash_pandas_object(
+        df[_ROW_KEY].astype(str), index=False
+    ).to_numpy()
+
+
+def validate_new_rows(df_before, df_after, allowed_uos, is_admin, working_uo):
+    # Linhas novas = chaves ausentes antes (uint64 comparados com np.isin)
+    is_new = np.isin(
+        _row_key_hashes(df_after), _row_key_hashes(df_before), invert=True
+    )
+    new_rows = df_after[is_new]
+
+    if not new_rows.empty:
+        req = new_rows[REQUIRED_ON_NEW]
+        # Vazio = nulo ou string vazia; uma única redução sobre o bloco
+        if (req.isna() | req.eq('')).to_numpy().any():
+            return (
+                False,
+                'Preencha todos os campos obrigatórios na nova linha.',
+                df_after,
+            )
+        # Nova linha já nasce marcada como Novo Marco (bool)
+        df_after.loc[is_new, 'novo_marco'] = True
+
+    if not is_admin:
+        if df_after['uo_cod'].isnull().any():
+            return False, 'Existem linhas sem UO definida.', df_after
+        # uo_cod já é inteiro desde normalize_dataframe: subconjunto checado
+        # com np.isin sobre os códigos únicos, sem listas/sets Python
+        uos_present = np.unique(df_after['uo_cod'].to_numpy(dtype=np.int64))
+        if (
+            allowed_uos is None
+            or not np.isin(
+                uos_present, np.fromiter(allowed_uos, dtype=np.int64)
+            ).all()
+        ):
+            return False, 'Você inseriu uma UO não autorizada.', df_after
+        if working_uo is not None and (uos_present != int(working_uo)).any():
+            return (
+                False,
+                f'As linhas devem pertencer à UO {working_uo}.',
+                df_after,
+            )
+
+    return True, '', df_after
+
+
+def validate_no_new_rows(
+    df_before, df_after
+) -> tuple[bool, str, pd.DataFrame]:
+    if np.isin(
+        _row_key_hashes(df_after), _row_key_hashes(df_before), invert=True
+    ).any():
+        return False, 'Inclusão de novas linhas desabilitada.', df_after
+    return True, '', df_after
+
+
+def apply_editor_edits(
+    df_base: pd.DataFrame, edits: Mapping, money_cols: list[str]
+) -> pd.DataFrame:
+    """
+    Reaplica sobre `df_base` (valores originais, na ordem do editor) apenas as
+    células de `edited_rows` do estado do st.data_editor; só as monetárias
+    editadas passam por parse_brl_edit. As linhas de `deleted_rows` saem.
+    """
+    out = df_base.copy()
+    for pos, cols in edits.get('edited_rows', {}).items():
+        label = df_base.index[int(pos)]
+        for c, v in cols.items():
+            out.at[label, c] = parse_brl_edit(v) if c in money_cols else v
+    deleted = edits.get('deleted_rows', [])
+    if deleted:
+        out = out.drop(index=df_base.index[deleted])
+    return out
+
+
+# =============================================================================
+# Google Sheets
+# =============================================================================
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_sheet(
+    _conn, spreadsheet: str, worksheet: str
+) -> tuple[pd.DataFrame, pd.DataFrame, str]:
+    """
+    Lê a aba do Google Sheets e devolve (bruto, normalizado, versão). Os dois
+    frames saem da mesma leitura, num único cache por planilha/aba: o índice
+    do normalizado (que chega ao editor) identifica sempre as mesmas linhas do
+    bruto usado ao salvar. O cache evita uma ida à API a cada rerun e é limpo
+    após salvar. A versão muda a cada nova leitura e entra nas chaves dos
+    caches derivados (filtros, frame de exibição).
+    """
+    data_raw = _conn.read(spreadsheet=spreadsheet, worksheet=worksheet, ttl=0)
+    return data_raw, normalize_by_content(data_raw), str(time.time_ns())
+
+
+def _frame_digest(df: pd.DataFrame) -> tuple:
+    """
+    Chave de conteúdo completa (colunas + índice + valores, sem
+    amostragem).
+    """
+    return tuple(df.columns), pd.util.hash_pandas_object(df).values.tobytes()
+
+
+@st.cache_data(
+    show_spinner=False, max_entries=8, hash_funcs={pd.DataFrame: _frame_digest}
+)
+def normalize_by_content(data_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    normalize_dataframe memoizado pelo conteúdo da aba: uma releitura sem
+    mudanças (TTL vencido, "Recarregar dados", pós-salvar) pula a normalização.
+    """
+    return normalize_dataframe(data_raw)
+
+
+def clear_sheet_cache() -> None:
+    """Descarta a leitura em cache (após salvar ou a pedido do usuário)."""
+    load_sheet.clear()
+    filter_options.clear()
+    display_frame.clear()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def filter_options(
+    df_key: str, _df: pd.DataFrame, cols: tuple[str, ...]
+) -> dict[str, list]:
+    """
+    Listas ordenadas (sem nulos) dos filtros. O cache é indexado por `df_key`
+    (usuário/planilha/aba/seleções), sem hashear o frame a cada rerun.
+    Colunas category saem dos códigos usados (inteiros), sem varrer textos.
+    """
+    out = {}
+    for c in cols:
+        s = _df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes = np.unique(s.cat.codes.to_numpy())
+            vals = s.cat.categories[codes[codes >= 0]].tolist()
+        else:
+            vals = s.dropna().unique().tolist()
+        out[c] = sorted(vals)
+    return out
+
+
+@st.cache_data(ttl=60, show_spinner=False, max_entries=16)
+def display_frame(
+    df_key: str, _df: pd.DataFrame, money_cols: tuple[str, ...]
+) -> pd.DataFrame:
+    """
+    Cópia do recorte para exibição/edição, com as colunas monetárias em
+    Texto BR. Indexado por `df_key` como `filter_options`: alternar toggles
+    ou reabrir a tela não refaz a formatação.
+    """
+    # Cópia rasa: só as colunas monetárias são substituídas (não escritas
+    # no lugar), então `_df` não é alterado
+    out = _df.copy(deep=False)
+    present = [c for c in money_cols if c in out.columns]
+    # Colunas numéricas formatadas como um bloco só (achatado): os valores
+    # distintos são formatados uma vez para todas as colunas juntas
+    block = [c for c in present if pd.api.types.is_numeric_dtype(out[c])]
+    if block:
+        flat = format_brl_series(
+            pd.Series(out[block].to_numpy(dtype='float64').ravel())
+        )
+        formatted = flat.to_numpy().reshape(len(out), len(block))
+        for j, col in enumerate(block):
+            out[col] = pd.Series(formatted[:, j], index=out.index)
+    # Demais (texto cru da planilha, ex. valor_previsto_total): por coluna
+    for col in present:
+        if col not in block:
+            out[col] = format_brl_series(out[col])
+    return out
+
+
+def _key_text(value) -> str:
+    """
+    Célula de chave como texto, do mesmo jeito na planilha e no DataFrame.
+    """
+    if pd.isna(value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _sheet_matches(ws, data_raw: pd.DataFrame) -> bool:
+    """
+    True se a aba ainda tem as linhas de `data_raw` nas mesmas posições:
+    relê só as colunas de _ROW_KEY (um único batch_get) e compara a
+    quantidade de linhas e a chave de cada uma.
+    """
+    letters = [
+        rowcol_to_a1(1, data_raw.columns.get_loc(c) + 1)[:-1] for c in _ROW_KEY
+    ]
+    remote = ws.batch_get([f'{col}2:{col}' for col in letters])
+    n = len(data_raw)
+    # A API corta as células vazias do fim: linhas a mais = inclusão remota
+    if max((len(vr) for vr in remote), default=0) > n:
+        return False
+    got = np.full((n, len(_ROW_KEY)), '', dtype=object)
+    for j, vr in enumerate(remote):
+        for i, row in enumerate(vr):
+            got[i, j] = _key_text(row[0]) if row else ''
+    expected = np.array(
+        [
+            [_key_text(v) for v in row]
+            for row in data_raw[_ROW_KEY].to_numpy(dtype=object)
+        ],
+        dtype=object,
+    ).reshape(n, len(_ROW_KEY))
+    return bool((got == expected).all())
+
+
+def update_sheet(
+    conn,
+    spreadsheet: str,
+    worksheet: str,
+    data_raw: pd.DataFrame,
+    final_df: pd.DataFrame,
+) -> None:
+    """
+    Grava no Google Sheets apenas as células alteradas (um único batchUpdate)
+    e anexa as linhas novas. Recai no `conn.update` completo quando o layout
+    da planilha difere de ALL_COLS, houve exclusão de linhas, a mudança
+    atinge mais da metade da planilha ou a aba mudou desde a leitura
+    (linhas incluídas/excluídas por outra sessão).
+    """
+    n = len(data_raw)
+    # Método privado do st-gsheets-connection (versão fixada no pyproject)
+    select_ws = getattr(
+        getattr(conn, 'client', None), '_select_worksheet', None
+    )
+    if select_ws is None:
+        _log.warning(
+            'conn.client._select_worksheet indisponível: '
+            'gravando a planilha inteira (conn.update)'
+        )
+    same_layout = list(data_raw.columns) == list(ALL_COLS) and final_df.index[
+        :n
+    ].equals(data_raw.index)
+    if select_ws is None or not same_layout:
+        conn.update(
+            spreadsheet=spreadsheet, worksheet=worksheet, data=final_df
+        )
+        return
+
+    atual = final_df.iloc[:n]
+    diff = atual.ne(data_raw) & ~(atual.isna() & data_raw.isna())
+    diff_arr = diff.to_numpy(dtype=bool, na_value=True)
+    changed = np.flatnonzero(diff_arr.any(axis=1))
+    novas = final_df.iloc[n:]
+    if len(changed) + len(novas) > len(final_df) / 2:
+        conn.update(
+            spreadsheet=spreadsheet, worksheet=worksheet, data=final_df
+        )
+        return
+
+    def _values(df: pd.DataFrame) -> list[list]:
+        return df.astype(object).where(df.notna(), '').values.tolist()
+
+    ws = select_ws(spreadsheet=spreadsheet, worksheet=worksheet)
+    # As posições i + 2 vêm de `data_raw` (até 60 s de cache): se outra
+    # sessão excluiu/incluiu linhas nesse meio tempo, elas apontariam para
+    # outro registro. Na dúvida, regrava a planilha inteira.
+    if not _sheet_matches(ws, data_raw):
+        _log.warning(
+            'Aba %s mudou desde a leitura: gravando a planilha '
+            'inteira (conn.update)',
+            worksheet,
+        )
+        conn.update(
+            spreadsheet=spreadsheet, worksheet=worksheet, data=final_df
+        )
+        return
+    if len(changed):
+        # Só as células alteradas, agrupadas em trechos contíguos de colunas:
+        # não sobrescreve o que outro usuário mudou nas demais colunas da
+        # linha.
+        # Linha 1 é o cabeçalho: a posição i do DataFrame é a linha i + 2
+        data = []
+        for i, row in zip(changed, _values(atual.iloc[changed])):
+            cols = np.flatnonzero(diff_arr[i])
+            for run in np.split(cols, np.flatnonzero(np.diff(cols) > 1) + 1):
+                lo, hi = int(run[0]), int(run[-1])
+                first = rowcol_to_a1(i + 2, lo + 1)
+                last = rowcol_to_a1(i + 2, hi + 1)
+                data.append({
+                    'range': f'{first}:{last}',
+                    'values': [row[lo : hi + 1]],
+                })
+        ws.batch_update(data, value_input_option='USER_ENTERED')
+    if len(novas):
+        ws.append_rows(
+            _values(novas), value_input_option='USER_ENTERED', table_range='A1'
+        )
+
+
+# =============================================================================
+# Execução e Restos a Pagar
+# =============================================================================
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_metrics_cached(fingerprint: tuple) -> tuple[float, float, float]:
+    """
+    `load_metrics` em cache; a impressão digital (mtime_ns + tamanho das
+    bases) na chave refaz o cálculo só quando algum arquivo muda.
+    """
+    return load_metrics()
+
+
+def load_metrics_cached() -> tuple[float, float, float]:
+    """
+    Métricas do topo: leem as bases de execução e RP inteiras, e não
+    dependem do usuário nem dos filtros da tela. Cada rerun custa só os
+    três `os.stat` da impressão digital.
+    """
+    return _load_metrics_cached(metrics_fingerprint())
+
+
+@st.cache_data(ttl=600, show_spinner=False, max_entries=16)
+def load_execucao_view_cached(restrict_uo: int | None = None) -> pd.DataFrame:
+    """
+    `load_execucao_view` em cache por recorte de RLS: trocar de aba, de
+    dimensão ou de métrica não refaz filtro + joins sobre a base inteira.
+    """
+    return load_execucao_view(restrict_uo=restrict_uo)
+
+
+@st.cache_data(ttl=600, show_spinner=False, max_entries=16)
+def load_rp_view_cached(restrict_uo: int | None = None) -> pd.DataFrame:
+    """
+    `load_rp_view` em cache por recorte de RLS (ver
+    `load_execucao_view_cached`).
+    """
+    return load_rp_view(restrict_uo=restrict_uo)
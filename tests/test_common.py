@@ -0,0 +1,412 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from my_pkg.transform.schema import ALL_COLS, BOOL_COLS, NUMERIC_COLS
+from my_pkg.ui.common import (
+    apply_editor_edits,
+    format_brl_edit,
+    format_brl_series,
+    normalize_dataframe,
+    parse_brl_edit,
+    parse_brl_series,
+    update_sheet,
+    validate_new_rows,
+    validate_no_new_rows,
+)
+
+# =============================================================================
+# Dados de apoio
+# =============================================================================
+
+
+def _raw_sheet(n=4):
+    """Aba do Cronograma como chega do Google Sheets (texto e números)."""
+    data = {c: [''] * n for c in ALL_COLS}
+    data.update({
+        'uo_cod': [1251, 1251, 2301, 2301][:n],
+        'uo_sigla': ['PMMG', 'PMMG', 'DER', 'DER'][:n],
+        'acao_cod': [10, 11, 12, 13][:n],
+        'acao_desc': ['Ação A', 'Ação B', 'Ação C', 'Ação D'][:n],
+        'intervencao_cod': [1, 2, 3, 4][:n],
+        'intervencao_desc': ['Obra'] * n,
+        'marcos_principais': ['M1', 'M2', 'M3', 'M4'][:n],
+        'valor_previsto_total': ['R$ 100,00'] * n,
+    })
+    for c in NUMERIC_COLS:
+        data[c] = [0] * n
+    for c in BOOL_COLS:
+        data[c] = ['FALSE'] * n
+    return pd.DataFrame(data, columns=ALL_COLS)
+
+
+def _new_row(**overrides):
+    row = {
+        'uo_cod': 1251,
+        'uo_sigla': 'PMMG',
+        'acao_cod': 99,
+        'acao_desc': 'Ação nova',
+        'intervencao_cod': 9,
+        'intervencao_desc': 'Obra nova',
+        'marcos_principais': 'M9',
+        'valor_previsto_total': 'R$ 50,00',
+    }
+    row.update(overrides)
+    return normalize_dataframe(pd.DataFrame([row]))
+
+
+class FakeWorksheet:
+    """Worksheet do gspread: registra as gravações e serve a chave remota."""
+
+    def __init__(self, remote):
+        self.remote = remote
+        self.batches = []
+        self.appends = []
+
+    def batch_get(self, ranges):
+        # Uma coluna por intervalo ("A2:A"), sem as células vazias do fim
+        out = []
+        for rng in ranges:
+            col = rng.split('2:')[0]
+            j = [
+                c
+                for c in self.remote.columns
+                if _col_letter(self.remote, c) == col
+            ][0]
+            out.append([[str(v)] for v in self.remote[j]])
+        return out
+
+    def batch_update(self, data, **kwargs):
+        self.batches.append((data, kwargs))
+
+    def append_rows(self, values, **kwargs):
+        self.appends.append((values, kwargs))
+
+
+def _col_letter(df, col):
+    n = df.columns.get_loc(col) + 1
+    letters = ''
+    while n:
+        n, r = divmod(n - 1, 26)
+        letters = chr(65 + r) + letters
+    return letters
+
+
+class FakeClient:
+    def __init__(self, ws):
+        self.ws = ws
+        self.opened = []
+
+    def _select_worksheet(self, spreadsheet=None, worksheet=None):
+        self.opened.append((spreadsheet, worksheet))
+        return self.ws
+
+
+class FakeConn:
+    def __init__(self, ws=None):
+        if ws is not None:
+            self.client = FakeClient(ws)
+        self.updates = []
+
+    def update(self, spreadsheet=None, worksheet=None, data=None):
+        self.updates.append((spreadsheet, worksheet, data))
+
+
+# =============================================================================
+# Formatação / leitura BRL
+# =============================================================================
+
+
+def test_parse_brl_series_matches_scalar():
+    values = [
+        'R$ 1.234,56',
+        ' R$ 0,50 ',
+        '1.000',
+        '',
+        None,
+        12,
+        3.5,
+        'abc',
+        '-7,25',
+        True,
+    ]
+    s = pd.Series(values, dtype=object)
+    expected = [parse_brl_edit(v) for v in values]
+    assert parse_brl_series(s).tolist() == expected
+
+
+def test_parse_brl_series_keeps_nan_from_numeric_cells():
+    s = pd.Series([np.nan, 'R$ 2,00'], dtype=object)
+    out = parse_brl_series(s)
+    assert np.isnan(out.iloc[0])
+    assert np.isnan(parse_brl_edit(np.nan))
+    assert out.iloc[1] == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize(
+    'values',
+    [
+        [1234.5, 0, -0.0, None, '', 'abc', '1234', 1e6, -12.3],
+        [1.0, np.nan, 0.0, 987654.321],
+    ],
+)
+def test_format_brl_series_matches_scalar(values):
+    dtype = object if any(isinstance(v, str) for v in values) else None
+    s = pd.Series(values, dtype=dtype, index=range(10, 10 + len(values)))
+    out = format_brl_series(s)
+    assert out.tolist() == [format_brl_edit(v) for v in values]
+    assert out.index.equals(s.index)
+
+
+# =============================================================================
+# normalize_dataframe
+# =============================================================================
+
+
+def test_normalize_dataframe_layout_and_types():
+    raw = pd.DataFrame({
+        'marcos_principais': ['M1', 'M2'],
+        'uo_cod': ['1251', '2301.0'],
+        'uo_sigla': ['PMMG', 'DER'],
+    })
+    out = normalize_dataframe(raw)
+    assert list(out.columns) == ALL_COLS
+    assert out['uo_cod'].tolist() == [1251, 2301]
+    assert pd.api.types.is_integer_dtype(out['uo_cod'])
+    assert isinstance(out['uo_sigla'].dtype, pd.CategoricalDtype)
+    # Colunas ausentes: numéricas viram 0.0 e checkboxes False
+    assert (out[NUMERIC_COLS] == 0.0).all().all()
+    assert all(pd.api.types.is_bool_dtype(t) for t in out[BOOL_COLS].dtypes)
+    assert not out[BOOL_COLS].to_numpy().any()
+
+
+def test_normalize_dataframe_code_dtypes_are_fixed():
+    # O tipo dos códigos não depende dos valores (nem do tamanho deles)
+    small = normalize_dataframe(_raw_sheet(2))
+    large = _raw_sheet(2)
+    large['acao_cod'] = [10, 2_000_000_000]
+    large = normalize_dataframe(large)
+    for c in ['uo_cod', 'acao_cod', 'intervencao_cod']:
+        assert small[c].dtype == 'Int64'
+        assert large[c].dtype == 'Int64'
+    assert large['acao_cod'].tolist() == [10, 2_000_000_000]
+
+
+def test_normalize_dataframe_parses_brl_money_text():
+    raw = _raw_sheet(3)
+    raw['valor_replanejado_total'] = ['R$ 1.234,56', 'R$ 10,00', '']
+    raw['1_bimestre_realizado'] = [' 2.000,5 ', 3, None]
+    out = normalize_dataframe(raw)
+    assert out['valor_replanejado_total'].tolist() == [1234.56, 10.0, 0.0]
+    assert out['1_bimestre_realizado'].tolist() == [2000.5, 3.0, 0.0]
+    assert out['valor_replanejado_total'].dtype == 'float64'
+
+
+def test_normalize_dataframe_reads_back_formatted_amounts():
+    # Mudança de comportamento no applayout: o padrão escapado antigo
+    # (r"\[R$\.\s\]") nunca casava, e os valores em Texto BR gravados pelo
+    # editor voltavam como 0.0. Agora o que o editor exibe é relido igual
+    raw = _raw_sheet(3)
+    valores = [1234.56, 0.5, 1_000_000.0]
+    raw['valor_replanejado_total'] = format_brl_series(pd.Series(valores))
+    out = normalize_dataframe(raw)
+    assert out['valor_replanejado_total'].tolist() == valores
+
+
+def test_normalize_dataframe_bool_tokens():
+    raw = _raw_sheet(4)
+    raw['1_bimestre_planejado'] = [' sim ', 'TRUE()', 'FALSE', None]
+    raw['2_bimestre_planejado'] = [True, False, True, False]
+    out = normalize_dataframe(raw)
+    assert out['1_bimestre_planejado'].tolist() == [True, True, False, False]
+    assert out['2_bimestre_planejado'].tolist() == [True, False, True, False]
+
+
+# =============================================================================
+# Validação das edições
+# =============================================================================
+
+
+def test_validate_new_rows_marks_new_row():
+    before = normalize_dataframe(_raw_sheet())
+    after = pd.concat([before, _new_row()], ignore_index=True)
+    ok, msg, out = validate_new_rows(before, after, None, True, None)
+    assert ok
+    assert not msg
+    assert out['novo_marco'].tolist() == [''] * 4 + [True]
+
+
+def test_validate_new_rows_requires_fields():
+    before = normalize_dataframe(_raw_sheet())
+    after = pd.concat(
+        [before, _new_row(marcos_principais='')], ignore_index=True
+    )
+    ok, msg, _ = validate_new_rows(before, after, None, True, None)
+    assert not ok
+    assert 'obrigatórios' in msg
+
+
+def test_validate_new_rows_rls():
+    before = normalize_dataframe(_raw_sheet(2))
+    after = pd.concat([before, _new_row(uo_cod=2301)], ignore_index=True)
+    ok, msg, _ = validate_new_rows(
+        before, after, frozenset({1251}), False, None
+    )
+    assert not ok
+    assert 'não autorizada' in msg
+    ok, _, _ = validate_new_rows(
+        before, after, frozenset({1251, 2301}), False, None
+    )
+    assert ok
+    ok, msg, _ = validate_new_rows(
+        before, after, frozenset({1251, 2301}), False, 1251
+    )
+    assert not ok
+    assert '1251' in msg
+
+
+def test_validate_no_new_rows():
+    before = normalize_dataframe(_raw_sheet())
+    assert validate_no_new_rows(before, before.iloc[::-1])[0]
+    after = pd.concat([before, _new_row()], ignore_index=True)
+    ok, msg, _ = validate_no_new_rows(before, after)
+    assert not ok
+    assert msg
+
+
+# =============================================================================
+# apply_editor_edits
+# =============================================================================
+
+
+def test_apply_editor_edits():
+    base = normalize_dataframe(_raw_sheet(3))
+    base.index = [10, 11, 12]
+    edits = {
+        'edited_rows': {
+            0: {'valor_replanejado_total': 'R$ 1.000,50'},
+            2: {'marcos_principais': 'Outro'},
+        },
+        'deleted_rows': [1],
+    }
+    out = apply_editor_edits(base, edits, ['valor_replanejado_total'])
+    assert out.index.tolist() == [10, 12]
+    assert out.at[10, 'valor_replanejado_total'] == pytest.approx(1000.5)
+    assert out.at[12, 'marcos_principais'] == 'Outro'
+    # A base (recorte em cache) não é alterada
+    assert base.at[10, 'valor_replanejado_total'] == 0.0
+    assert base.index.tolist() == [10, 11, 12]
+
+
+# =============================================================================
+# update_sheet
+# =============================================================================
+
+
+def test_update_sheet_writes_changed_cell_runs():
+    raw = _raw_sheet()
+    final = raw.copy()
+    final.loc[1, ['1_bimestre_realizado', '2_bimestre_planejado']] = [
+        5,
+        'TRUE',
+    ]
+    final.loc[1, '6_bimestre_realizado'] = 7
+    ws = FakeWorksheet(raw)
+    conn = FakeConn(ws)
+    update_sheet(conn, 'planilha', 'aba', raw, final)
+    assert conn.updates == []
+    assert conn.client.opened == [('planilha', 'aba')]
+    assert ws.appends == []
+    [(data, kwargs)] = ws.batches
+    # Posição 1 do DataFrame = linha 3 da planilha (linha 1 é o cabeçalho)
+    assert data == [
+        {'range': 'M3:N3', 'values': [[5, 'TRUE']]},
+        {'range': 'AB3:AB3', 'values': [[7]]},
+    ]
+    assert kwargs == {'value_input_option': 'USER_ENTERED'}
+
+
+def test_update_sheet_appends_new_rows():
+    raw = _raw_sheet()
+    new = _raw_sheet(1)
+    new['marcos_principais'] = ['M9']
+    new['valor_replanejado_total'] = [np.nan]
+    final = pd.concat([raw, new], ignore_index=True)
+    ws = FakeWorksheet(raw)
+    conn = FakeConn(ws)
+    update_sheet(conn, 'planilha', 'aba', raw, final)
+    assert conn.updates == []
+    assert ws.batches == []
+    [(values, kwargs)] = ws.appends
+    assert len(values) == 1
+    assert values[0][ALL_COLS.index('marcos_principais')] == 'M9'
+    assert not values[0][ALL_COLS.index('valor_replanejado_total')]
+    assert kwargs == {
+        'value_input_option': 'USER_ENTERED',
+        'table_range': 'A1',
+    }
+
+
+def _assert_full_update(conn, final, ws=None):
+    [(spreadsheet, worksheet, data)] = conn.updates
+    assert (spreadsheet, worksheet) == ('planilha', 'aba')
+    assert data is final
+    if ws is not None:
+        assert ws.batches == []
+        assert ws.appends == []
+
+
+def test_update_sheet_fallback_without_select_worksheet(caplog):
+    raw = _raw_sheet()
+    final = raw.copy()
+    final.loc[0, 'valor_replanejado_total'] = 1
+    conn = FakeConn()
+    with caplog.at_level(logging.WARNING, logger='my_pkg.ui.common'):
+        update_sheet(conn, 'planilha', 'aba', raw, final)
+    _assert_full_update(conn, final)
+    assert '_select_worksheet' in caplog.text
+
+
+def test_update_sheet_fallback_on_other_layout():
+    raw = _raw_sheet()[ALL_COLS[::-1]]
+    final = raw.copy()
+    final.loc[0, 'valor_replanejado_total'] = 1
+    ws = FakeWorksheet(raw)
+    conn = FakeConn(ws)
+    update_sheet(conn, 'planilha', 'aba', raw, final)
+    _assert_full_update(conn, final, ws)
+
+
+def test_update_sheet_fallback_on_deleted_rows():
+    raw = _raw_sheet()
+    final = raw.drop(index=1)
+    ws = FakeWorksheet(raw)
+    conn = FakeConn(ws)
+    update_sheet(conn, 'planilha', 'aba', raw, final)
+    _assert_full_update(conn, final, ws)
+
+
+def test_update_sheet_fallback_on_large_change():
+    raw = _raw_sheet()
+    final = raw.copy()
+    final.loc[[0, 1, 2], 'valor_replanejado_total'] = 1
+    ws = FakeWorksheet(raw)
+    conn = FakeConn(ws)
+    update_sheet(conn, 'planilha', 'aba', raw, final)
+    _assert_full_update(conn, final, ws)
+
+
+@pytest.mark.parametrize('remote_rows', [[0, 2, 3], [0, 1, 2, 3, 0]])
+def test_update_sheet_fallback_when_sheet_changed(remote_rows, caplog):
+    # Outra sessão excluiu (ou incluiu) linhas depois da leitura em cache
+    raw = _raw_sheet()
+    final = raw.copy()
+    final.loc[2, 'valor_replanejado_total'] = 1
+    ws = FakeWorksheet(raw.iloc[remote_rows].reset_index(drop=True))
+    conn = FakeConn(ws)
+    with caplog.at_level(logging.WARNING, logger='my_pkg.ui.common'):
+        update_sheet(conn, 'planilha', 'aba', raw, final)
+    _assert_full_update(conn, final, ws)
+    assert 'mudou desde a leitura' in caplog.text